@@ -1,13 +1,53 @@
 import streamlit as st
 import json
+import math
 import pandas as pd
 import io
-from typing import Any, Dict, Union
+import csv
+from typing import Any, Dict, List, Tuple, Union
 import zipfile
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import re
+import functools
+import hashlib
 import streamlit.components.v1 as components
 
+# Prefer orjson for parsing/serializing when installed, stdlib json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson silently turns integers beyond 64 bits into floats, so text with a run of 19+
+# digits is parsed by the stdlib instead. Digits are masked to b'0' and everything else
+# to b' ' so the check is one C-level translate plus a substring search
+_DIGIT_MASK = bytes(0x30 if 0x30 <= b <= 0x39 else 0x20 for b in range(256))
+_LONG_DIGIT_RUN = b'0' * 19
+
+# Excel export needs openpyxl; detect it once at import time
+try:
+    import openpyxl
+    EXCEL_AVAILABLE = True
+except ImportError:
+    openpyxl = None
+    EXCEL_AVAILABLE = False
+
+# Deepest nesting the flattener will walk before rejecting the document. The stdlib
+# parser hits Python's recursion limit (RecursionError) near 1,000 levels, so the cap
+# sits well below that and applies whichever parser is in use
+MAX_DEPTH = 500
+
+# Batch workers start from a fresh interpreter (forkserver, or spawn where that is all
+# there is) rather than a fork of the multithreaded Streamlit server, which can leave a
+# child stuck on a lock another thread held. Each worker re-imports the app, which takes
+# a couple of seconds, so only batches with at least this much JSON use the pool
+BATCH_POOL_CONTEXT = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+BATCH_POOL_MIN_BYTES = 2 * 1024 * 1024
+
 # Set page config
 st.set_page_config(
     page_title="JSON Flattener",
@@ -16,14 +56,41 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+def load_json(content: Union[str, bytes]) -> Any:
+    """Parse JSON text, using orjson when available and it parses the text exactly like the stdlib."""
+    if orjson is not None:
+        raw = content.encode('utf-8') if isinstance(content, str) else content
+        if _LONG_DIGIT_RUN not in raw.translate(_DIGIT_MASK):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                # NaN/Infinity, which the stdlib accepts, or invalid JSON, which it reports
+                pass
+    return json.loads(content)
+
+def dump_json_pretty(data: Dict[str, Any]) -> bytes:
+    """Serialize a flat mapping as indented, non-ASCII-escaped UTF-8 JSON, using orjson when available."""
+    if orjson is not None:
+        try:
+            output = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits, which the stdlib writes exactly
+            output = None
+        # orjson writes NaN/Infinity as null where the stdlib keeps them
+        if output is not None and not (b'null' in output and any(
+                isinstance(value, float) and not math.isfinite(value) for value in data.values())):
+            return output
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+@functools.lru_cache(maxsize=32)
 def create_clipboard_component(text_data, button_text, success_message):
     """Create a working clipboard copy component"""
     
-    # Create unique key for this component
-    component_key = f"clipboard_{abs(hash(text_data[:100]))}"
+    # Create unique key for this component from a stable hash of the full content
+    component_key = f"clipboard_{hashlib.blake2b(text_data.encode('utf-8', 'ignore'), digest_size=8).hexdigest()}"
     
-    # Escape the text data for JavaScript
-    escaped_text = text_data.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+    # Encode the text data as a JavaScript string literal ("</" escaped so it can't close the script tag)
+    js_literal = json.dumps(text_data).replace('</', '<\\/')
     
     # HTML and JavaScript for clipboard functionality
     html_code = f"""
@@ -46,7 +113,7 @@ def create_clipboard_component(text_data, button_text, success_message):
     
     <script>
         function copyToClipboard_{component_key}() {{
-            const text = "{escaped_text}";
+            const text = {js_literal};
             
             if (navigator.clipboard) {{
                 navigator.clipboard.writeText(text).then(function() {{
@@ -94,132 +161,219 @@ def create_clipboard_component(text_data, button_text, success_message):
     
     return html_code
 
-def flatten_json_data(json_data: Union[str, Dict]) -> Dict[str, Any]:
+@st.cache_data(show_spinner=False)
+def process_json(json_data: Union[str, bytes, Dict]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
     """
-    Flattens a JSON object (including arrays and nested objects) into a flat dictionary.
+    Walks the JSON tree once, returning the structure analysis and the flattened data.
     """
+    # Parse JSON if it's a string or raw bytes
+    if isinstance(json_data, (str, bytes)):
+        data = load_json(json_data)
+    else:
+        data = json_data
+    
+    analysis = {
+        'arrays': [],
+        'nested_objects': [],
+        'primitive_fields': 0
+    }
+    # Leaves are collected as (key, value) pairs and turned into a dict once at the end.
+    # Keys are not unique by construction ({'a_b': 1, 'a': {'b': 2}} both yield 'a_b'),
+    # so that final dict is what resolves collisions - later values win.
+    pairs = []
+    
+    # Frames are (node, flat key, analysis path, role, depth). The role is 'member' for
+    # object values, 'sample' for the first item of an array (the analysis only
+    # looks at that one) and None for nodes the analysis skips.
+    stack = [(data, '', '', 'sample', 0)]
     
-    def flatten_dict(obj: Any, parent_key: str = '', sep: str = '_') -> Dict[str, Any]:
-        """Recursively flatten nested dictionaries and arrays."""
-        items = []
+    while stack:
+        obj, parent_key, path, role, depth = stack.pop()
+        
+        if depth > MAX_DEPTH:
+            raise ValueError(f"JSON nesting exceeds {MAX_DEPTH} levels")
         
         if isinstance(obj, dict):
-            for key, value in obj.items():
-                new_key = f"{parent_key}{sep}{key}" if parent_key else key
-                items.extend(flatten_dict(value, new_key, sep).items())
-                
+            if role == 'member':
+                analysis['nested_objects'].append(path)
+            child_role = 'member' if role else None
+            
+            # Push children in reverse so they pop in document order
+            for key in reversed(obj):
+                stack.append((
+                    obj[key],
+                    parent_key + '_' + key if parent_key else key,
+                    (path + '.' + key if path else key) if child_role else '',
+                    child_role,
+                    depth + 1
+                ))
+        
         elif isinstance(obj, list):
+            if role == 'member':
+                analysis['arrays'].append({
+                    'path': path,
+                    'length': len(obj),
+                    'type': 'array'
+                })
+            
             if len(obj) == 0:
-                items.append((parent_key, "[]"))
+                pairs.append((parent_key, "[]"))
             else:
-                for i, item in enumerate(obj):
-                    new_key = f"{parent_key}{sep}{i}"
-                    if isinstance(item, (dict, list)):
-                        items.extend(flatten_dict(item, new_key, sep).items())
-                    else:
-                        items.append((new_key, item))
+                for i in range(len(obj) - 1, -1, -1):
+                    sampled = role == 'member' and i == 0
+                    stack.append((
+                        obj[i],
+                        parent_key + '_' + str(i),
+                        path + '[0]' if sampled else '',
+                        'sample' if sampled else None,
+                        depth + 1
+                    ))
         else:
-            items.append((parent_key, obj))
-            
-        return dict(items)
+            if role == 'member':
+                analysis['primitive_fields'] += 1
+            pairs.append((parent_key, obj))
     
-    # Parse JSON if it's a string
-    if isinstance(json_data, str):
-        try:
-            data = json.loads(json_data)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON string: {e}")
-    else:
-        data = json_data
-    
-    return flatten_dict(data)
+    return analysis, dict(pairs)
+
+def flatten_json_data(json_data: Union[str, bytes, Dict]) -> Dict[str, Any]:
+    """
+    Flattens a JSON object (including arrays and nested objects) into a flat dictionary.
+    """
+    try:
+        return process_json(json_data)[1]
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON string: {e}")
 
 def format_field_name(field_name: str) -> str:
     """Convert snake_case field names to Title Case for better readability."""
     return field_name.replace('_', ' ').title()
 
-def analyze_json_structure(json_data: Union[str, Dict]) -> Dict[str, Any]:
+def analyze_json_structure(json_data: Union[str, bytes, Dict]) -> Dict[str, Any]:
     """Analyze the structure of JSON to understand arrays and nested objects."""
-    if isinstance(json_data, str):
-        data = json.loads(json_data)
-    else:
-        data = json_data
-    
-    def analyze_recursive(obj: Any, path: str = "") -> Dict[str, Any]:
-        analysis = {
-            'arrays': [],
-            'nested_objects': [],
-            'primitive_fields': 0
-        }
-        
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                current_path = f"{path}.{key}" if path else key
-                
-                if isinstance(value, list):
-                    analysis['arrays'].append({
-                        'path': current_path,
-                        'length': len(value),
-                        'type': 'array'
-                    })
-                    # Analyze array contents
-                    for item in value[:1]:  # Sample first item
-                        sub_analysis = analyze_recursive(item, f"{current_path}[0]")
-                        analysis['arrays'].extend(sub_analysis['arrays'])
-                        analysis['nested_objects'].extend(sub_analysis['nested_objects'])
-                        analysis['primitive_fields'] += sub_analysis['primitive_fields']
-                elif isinstance(value, dict):
-                    analysis['nested_objects'].append(current_path)
-                    sub_analysis = analyze_recursive(value, current_path)
-                    analysis['arrays'].extend(sub_analysis['arrays'])
-                    analysis['nested_objects'].extend(sub_analysis['nested_objects'])
-                    analysis['primitive_fields'] += sub_analysis['primitive_fields']
-                else:
-                    analysis['primitive_fields'] += 1
-        
-        return analysis
-    
-    return analyze_recursive(data)
+    return process_json(json_data)[0]
 
+@st.cache_data(show_spinner=False)
 def create_download_files(flattened_data: Dict[str, Any], filename_base: str):
     """Create downloadable files in different formats."""
     
-    # Create DataFrame with proper value formatting
-    df = pd.DataFrame([
-        {'Field': format_field_name(field), 'Value': f'{value}' if value is not None else 'N/A'}
-        for field, value in flattened_data.items()
-    ])
+    # Leaves are only ever str/int/float/bool/None, so strings pass through untouched,
+    # None becomes 'N/A' and only the remaining scalars need str()
+    values = [
+        value if type(value) is str else 'N/A' if value is None else str(value)
+        for value in flattened_data.values()
+    ]
     
-    # TSV content
-    tsv_content = df.to_csv(sep='\t', index=False)
+    # Create DataFrame column-wise with vectorized field-name formatting
+    fields = pd.Series(list(flattened_data.keys()), dtype=object)
+    df = pd.DataFrame({
+        'Field': fields.str.replace('_', ' ', regex=False).str.title(),
+        'Value': pd.Series(values, dtype=object)
+    })
     
-    # CSV content  
-    csv_content = df.to_csv(index=False)
+    # Pretty field names are computed once and shared by every output format
+    pretty_fields = df['Field'].tolist()
     
-    # Excel content - with error handling
-    excel_content = None
-    try:
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Flattened_Data', index=False)
-        excel_content = excel_buffer.getvalue()
-    except ImportError:
-        # If openpyxl is not available, create a simple Excel-compatible CSV
-        excel_content = csv_content.encode('utf-8')
+    # Write both delimited formats straight from the column lists
+    rows = list(zip(pretty_fields, values))
+    
+    def write_delimited(delimiter: str) -> str:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, delimiter=delimiter, lineterminator='\n')
+        writer.writerow(('Field', 'Value'))
+        writer.writerows(rows)
+        return buffer.getvalue()
+    
+    # TSV content - text for the clipboard, bytes for downloads
+    tsv_text = write_delimited('\t')
+    tsv_content = tsv_text.encode('utf-8')
+    
+    # CSV content  
+    csv_content = write_delimited(',').encode('utf-8')
     
     # JSON content (flattened)
-    json_content = json.dumps({
-        format_field_name(field): value for field, value in flattened_data.items()
-    }, indent=2, ensure_ascii=False)
+    json_content = dump_json_pretty(dict(zip(pretty_fields, flattened_data.values())))
     
+    # Payloads are returned as bytes so downloads don't re-encode them on every rerun
     return {
+        'tsv_text': tsv_text,
         'tsv': tsv_content,
         'csv': csv_content, 
-        'excel': excel_content,
         'json': json_content,
         'dataframe': df
     }
 
+@st.cache_data(show_spinner=False)
+def build_xlsx(df: pd.DataFrame) -> bytes:
+    """Build the Excel download on demand using openpyxl's write-only mode."""
+    workbook = openpyxl.Workbook(write_only=True)
+    worksheet = workbook.create_sheet('Flattened_Data')
+    worksheet.append(tuple(df.columns))
+    for row in df.itertuples(index=False, name=None):
+        worksheet.append(row)
+    
+    excel_buffer = io.BytesIO()
+    workbook.save(excel_buffer)
+    return excel_buffer.getvalue()
+
+def process_batch_file(filename: str, raw: bytes) -> Dict[str, Any]:
+    """Flatten one uploaded batch file; runs in a worker process."""
+    try:
+        flattened = flatten_json_data(raw)
+        return {
+            'filename': filename,
+            'flattened_data': flattened,
+            'files': create_download_files(flattened, filename.replace('.json', '')),
+            'status': 'success',
+            'fields_count': len(flattened)
+        }
+    except Exception as e:
+        return {
+            'filename': filename,
+            'status': 'error',
+            'error': str(e)
+        }
+
+def process_batch(payloads: List[Tuple[str, bytes]], progress_bar) -> List[Dict[str, Any]]:
+    """Flatten batch files across worker processes, redoing in-process whatever the pool can't."""
+    results = [None] * len(payloads)
+    done = 0
+    
+    def advance():
+        nonlocal done
+        done += 1
+        progress_bar.progress(done / len(payloads))
+    
+    # Single files, small batches and single-CPU hosts are cheaper to flatten in-process
+    workers = min(len(payloads), os.cpu_count() or 1)
+    if workers > 1 and sum(len(raw) for _, raw in payloads) >= BATCH_POOL_MIN_BYTES:
+        # A pool may be unavailable here (no process support, a spawn failure) or break
+        # mid-batch when a worker dies; results already back are kept either way
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=BATCH_POOL_CONTEXT) as executor:
+                futures = {}
+                try:
+                    for i, (name, raw) in enumerate(payloads):
+                        futures[executor.submit(process_batch_file, name, raw)] = i
+                except (OSError, BrokenProcessPool):
+                    pass
+                for future in as_completed(futures):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception:
+                        # process_batch_file reports its own errors, so this is the pool
+                        # failing (a dead worker, unpicklable work); redo it below
+                        continue
+                    advance()
+        except (OSError, BrokenProcessPool, NotImplementedError):
+            pass
+    
+    for i, (name, raw) in enumerate(payloads):
+        if results[i] is None:
+            results[i] = process_batch_file(name, raw)
+            advance()
+    
+    return results
+
 def main():
     """Main Streamlit app."""
     
@@ -228,11 +382,7 @@ def main():
     st.markdown("Convert nested JSON data (including arrays and objects) into flat spreadsheet format")
     
     # Check for missing dependencies
-    try:
-        import openpyxl
-        excel_available = True
-    except ImportError:
-        excel_available = False
+    if not EXCEL_AVAILABLE:
         st.warning("⚠️ Excel export requires openpyxl. Add 'openpyxl>=3.1.0' to requirements.txt for full functionality. TSV and CSV work perfectly!")
     
     # Sidebar
@@ -287,9 +437,9 @@ def main():
         
         if uploaded_file is not None:
             try:
-                # Read the file
-                content = uploaded_file.read().decode('utf-8')
-                json_data = json.loads(content)
+                # Read the file - the raw bytes are parsed directly and double as the cache key
+                content = uploaded_file.getvalue()
+                analysis = analyze_json_structure(content)
                 
                 # Display file info
                 st.success(f"✅ Successfully loaded: **{uploaded_file.name}**")
@@ -298,7 +448,6 @@ def main():
                 
                 with col1:
                     st.subheader("📊 Structure Analysis")
-                    analysis = analyze_json_structure(json_data)
                     
                     st.metric("Arrays Found", len(analysis['arrays']))
                     st.metric("Nested Objects", len(analysis['nested_objects']))
@@ -317,7 +466,7 @@ def main():
                     if st.button("🚀 Flatten JSON", type="primary"):
                         with st.spinner("Flattening JSON data..."):
                             # Flatten the data
-                            flattened = flatten_json_data(json_data)
+                            flattened = flatten_json_data(content)
                             
                             # Create download files
                             files = create_download_files(flattened, uploaded_file.name.replace('.json', ''))
@@ -355,7 +504,7 @@ def main():
                         # TSV Copy Button
                         st.write("**📝 TSV Format (Perfect for Excel):**")
                         tsv_component = create_clipboard_component(
-                            files['tsv'], 
+                            files['tsv_text'], 
                             "📝 Copy", 
                             "Copied to clipboard!"
                         )
@@ -369,7 +518,12 @@ def main():
                     # Preview section
                     st.subheader("👀 Preview Data")
                     with st.expander("Preview flattened data", expanded=False):
-                        st.dataframe(files['dataframe'], use_container_width=True)
+                        # Cap the default preview so large flattens stay cheap to rerender
+                        preview_df = files['dataframe']
+                        st.dataframe(preview_df.head(500), use_container_width=True)
+                        
+                        if len(preview_df) > 500 and st.button("Show all rows"):
+                            st.dataframe(preview_df, use_container_width=True)
                     
                     # Download buttons section
                     st.write("**💾 Download Files:**")
@@ -393,10 +547,11 @@ def main():
                     
                     with col3:
                         try:
-                            if files['excel']:
+                            if EXCEL_AVAILABLE:
+                                # Workbook is only built when the button is clicked
                                 st.download_button(
                                     label="📊 Download Excel",
-                                    data=files['excel'],
+                                    data=functools.partial(build_xlsx, files['dataframe']),
                                     file_name=f"{base_filename}_flattened.xlsx",
                                     mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
                                 )
@@ -427,6 +582,8 @@ def main():
                         
             except json.JSONDecodeError as e:
                 st.error(f"❌ Invalid JSON file: {e}")
+            except (ValueError, RecursionError) as e:
+                st.error(f"❌ Invalid JSON file: {e}")
             except Exception as e:
                 st.error(f"❌ Error processing file: {e}")
     
@@ -445,29 +602,9 @@ def main():
             
             if st.button("🚀 Process All Files", type="primary"):
                 progress_bar = st.progress(0)
-                results = []
                 
-                for i, file in enumerate(uploaded_files):
-                    try:
-                        content = file.read().decode('utf-8')
-                        json_data = json.loads(content)
-                        flattened = flatten_json_data(json_data)
-                        
-                        results.append({
-                            'filename': file.name,
-                            'flattened_data': flattened,
-                            'status': 'success',
-                            'fields_count': len(flattened)
-                        })
-                        
-                    except Exception as e:
-                        results.append({
-                            'filename': file.name,
-                            'status': 'error',
-                            'error': str(e)
-                        })
-                    
-                    progress_bar.progress((i + 1) / len(uploaded_files))
+                payloads = [(file.name, file.getvalue()) for file in uploaded_files]
+                results = process_batch(payloads, progress_bar)
                 
                 # Show results summary
                 st.subheader("📊 Processing Results")
@@ -486,19 +623,17 @@ def main():
                     # Create ZIP file with all results
                     zip_buffer = io.BytesIO()
                     
-                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zip_file:
                         for result in results:
                             if result['status'] == 'success':
                                 base_name = result['filename'].replace('.json', '')
-                                files = create_download_files(result['flattened_data'], base_name)
+                                files = result['files']
                                 
                                 # Add files to ZIP
                                 zip_file.writestr(f"{base_name}_flattened.csv", files['csv'])
                                 zip_file.writestr(f"{base_name}_flattened.tsv", files['tsv'])
                                 zip_file.writestr(f"{base_name}_flattened.json", files['json'])
                     
-                    zip_buffer.seek(0)
-                    
                     st.download_button(
                         label="📦 Download All (ZIP)",
                         data=zip_buffer.getvalue(),
@@ -525,20 +660,19 @@ def main():
         if json_text.strip():
             try:
                 # Validate JSON
-                json_data = json.loads(json_text)
+                analysis = analyze_json_structure(json_text)
                 st.success("✅ Valid JSON detected")
                 
                 col1, col2 = st.columns([1, 1])
                 
                 with col1:
-                    analysis = analyze_json_structure(json_data)
                     st.metric("Arrays", len(analysis['arrays']))
                     st.metric("Nested Objects", len(analysis['nested_objects']))
                     st.metric("Fields", analysis['primitive_fields'])
                 
                 with col2:
                     if st.button("🚀 Flatten Pasted JSON", type="primary"):
-                        flattened = flatten_json_data(json_data)
+                        flattened = flatten_json_data(json_text)
                         files = create_download_files(flattened, "pasted_json")
                         
                         st.success(f"✅ Flattened into **{len(flattened)} fields**")
@@ -553,7 +687,7 @@ def main():
                         
                         with col1:
                             tsv_component = create_clipboard_component(
-                                files['tsv'],
+                                files['tsv_text'],
                                 "📝 Copy",
                                 "Copied!"
                             )
@@ -579,10 +713,10 @@ def main():
                         
                         with col3:
                             try:
-                                if files['excel'] and len(files['excel']) > len(files['csv']):
+                                if EXCEL_AVAILABLE:
                                     st.download_button(
                                         label="📊 Excel",
-                                        data=files['excel'],
+                                        data=functools.partial(build_xlsx, files['dataframe']),
                                         file_name="pasted_json_flattened.xlsx"
                                     )
                                 else:
@@ -600,7 +734,8 @@ def main():
                                     help="Excel format not available"
                                 )
                             
-            except json.JSONDecodeError as e:
+            except (ValueError, RecursionError) as e:
+                # JSONDecodeError is a ValueError, as is the MAX_DEPTH rejection
                 st.error(f"❌ Invalid JSON: {e}")
 
 if __name__ == "__main__":
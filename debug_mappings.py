@@ -3,6 +3,10 @@
 Debug the field mappings to see what's happening
 """
 import json
+import sys
+import functools
+import re
+from types import MappingProxyType
 
 # Load the JSON data
 json_data = {
@@ -32,6 +36,69 @@ json_data = {
     "stockholder_amount_paid_2": 50000
 }
 
+# Freeze it read-only (the key indexes below are derived from it once) with interned keys
+json_data = MappingProxyType({sys.intern(key): value for key, value in json_data.items()})
+
+# Specific field-name -> JSON key mappings
+FIELD_MAPPINGS = {
+    'Corporate Name': 'business_trade_name',  # Should map to business_trade_name
+    'Covered Person (AML)': 'covered_person_aml',
+    'AMLA Category 8': 'amla_category_8',
+    'AMLA Compliance Status': 'amla_compliance_status',
+    'Director/Officer_INC\'R': 'director_officer_inc_r',
+    'Director/Officer_Exec Comm.': 'director_officer_exec_comm',
+    'Stockholder_Total Shares Subscribed_No.': 'stockholder_shares_subscribed_number',
+    'Stockholder_Total Shares Subscribed_Amount (PHP)': 'stockholder_shares_subscribed_amount',
+    'Stockholder_Amount Paid (PHP)': 'stockholder_amount_paid',
+}
+
+# Field-name prefixes of repeated (numbered) sections
+_REPEATED_PREFIXES = ('Director/Officer', 'Stockholder')
+
+# Single-pass translation tables for the key transforms
+_SEPARATORS = str.maketrans({' ': '_', '/': '_', '-': '_'})
+_NORMALIZE = str.maketrans({' ': '_', '/': '_', '-': '_', '(': None, ')': None, '≥': None, '.': None, "'": None})
+_NUMBERED_BASE = str.maketrans({' ': '_', '/': '_', '-': '_', '(': None, ')': None, "'": None})
+
+@functools.lru_cache(maxsize=None)
+def candidate_keys(field_name):
+    """Build the ordered candidate JSON keys for a field, like the app does"""
+    possible_keys = [field_name]
+    
+    base_transforms = [
+        field_name.lower().translate(_NORMALIZE),
+        field_name.translate(_SEPARATORS),
+        field_name.lower().replace(' ', '_'),
+        field_name.replace(' ', '').lower(),
+    ]
+    
+    # Add specific mappings ahead of the generic transforms
+    mapped_field = FIELD_MAPPINGS.get(field_name)
+    if mapped_field:
+        possible_keys.append(mapped_field)
+    
+    possible_keys.extend(base_transforms)
+    
+    # Remove duplicates, keeping first-seen order
+    possible_keys = list(dict.fromkeys(possible_keys))
+    
+    # Intern candidates so dict probes against the (interned) JSON keys can match by identity
+    return tuple(map(sys.intern, possible_keys))
+
+# Lowercased JSON keys, computed once for the similar-key scan
+LOWERED_KEYS = [(key, key.lower()) for key in json_data]
+
+# json_data is fixed for the run, so its sorted key listing is computed at import
+SORTED_KEYS = sorted(json_data)
+
+@functools.lru_cache(maxsize=None)
+def numbered_keys(field_name):
+    """Build the numbered candidate keys for a repeated field, highest number first"""
+    if not field_name.startswith(_REPEATED_PREFIXES):
+        return ()
+    base_key = field_name.lower().translate(_NUMBERED_BASE)
+    return tuple(sys.intern(f"{base_key}_{i}") for i in (2, 1))  # Test _2 and _1
+
 # Test problematic fields
 problem_fields = [
     "Corporate Name",
@@ -45,70 +112,44 @@ problem_fields = [
     "Stockholder_Amount Paid (PHP)"
 ]
 
-print("=== DEBUGGING FIELD MAPPINGS ===")
-print(f"Available JSON keys: {sorted(json_data.keys())}")
-print()
+# Collect output lines and write them in one batch at the end
+out = []
+
+out.append("=== DEBUGGING FIELD MAPPINGS ===")
+out.append(f"Available JSON keys: {SORTED_KEYS}")
+out.append('')
 
 # Test each problematic field
 for field_name in problem_fields:
-    print(f"Testing field: '{field_name}'")
+    out.append(f"Testing field: '{field_name}'")
     
-    # Create transformations like the app does
-    possible_keys = [field_name]
+    # Candidate keys are built once per field name; repeated fields try their
+    # numbered keys first
+    possible_keys = list(numbered_keys(field_name) + candidate_keys(field_name))
     
-    base_transforms = [
-        field_name.lower().replace(' ', '_').replace('/', '_').replace('-', '_').replace('(', '').replace(')', '').replace('≥', '').replace('.', '').replace("'", ''),
-        field_name.replace(' ', '_').replace('/', '_').replace('-', '_'),
-        field_name.lower().replace(' ', '_'),
-        field_name.replace(' ', '').lower(),
-    ]
-    
-    # Add specific mappings
-    field_mappings = {
-        'Corporate Name': 'business_trade_name',  # Should map to business_trade_name
-        'Covered Person (AML)': 'covered_person_aml',
-        'AMLA Category 8': 'amla_category_8',
-        'AMLA Compliance Status': 'amla_compliance_status',
-        'Director/Officer_INC\'R': 'director_officer_inc_r',
-        'Director/Officer_Exec Comm.': 'director_officer_exec_comm',
-        'Stockholder_Total Shares Subscribed_No.': 'stockholder_shares_subscribed_number',
-        'Stockholder_Total Shares Subscribed_Amount (PHP)': 'stockholder_shares_subscribed_amount',
-        'Stockholder_Amount Paid (PHP)': 'stockholder_amount_paid',
-    }
-    
-    if field_name in field_mappings:
-        mapped_field = field_mappings[field_name]
-        if mapped_field:
-            base_transforms.insert(0, mapped_field)
-    
-    possible_keys.extend(base_transforms)
-    
-    # Remove duplicates
-    seen = set()
-    possible_keys = [x for x in possible_keys if not (x in seen or seen.add(x))]
-    
-    # For repeated fields, add numbered versions
-    if field_name.startswith(('Director/Officer', 'Stockholder')):
-        base_key = field_name.lower().replace(' ', '_').replace('/', '_').replace('-', '_').replace('(', '').replace(')', '').replace("'", '')
-        for i in range(1, 3):  # Test _1 and _2
-            numbered_key = f"{base_key}_{i}"
-            possible_keys.insert(0, numbered_key)
-    
-    print(f"  Trying keys: {possible_keys[:5]}...")  # Show first 5
+    out.append(f"  Trying keys: {possible_keys[:5]}...")  # Show first 5
     
     # Find matches
     found = False
     for key in possible_keys:
         if key in json_data:
-            print(f"  ✅ FOUND: '{key}' = {json_data[key]}")
+            out.append(f"  ✅ FOUND: '{key}' = {json_data[key]}")
             found = True
             break
     
     if not found:
-        print(f"  ❌ NOT FOUND")
+        out.append(f"  ❌ NOT FOUND")
         # Show what keys we have that are similar
-        similar_keys = [k for k in json_data.keys() if any(part in k.lower() for part in field_name.lower().split())]
+        parts = field_name.lower().split()
+        if len(parts) <= 3:
+            similar_keys = [k for k, k_lower in LOWERED_KEYS if any(part in k_lower for part in parts)]
+        else:
+            # Many words: scan each key once with a single alternation pattern
+            pattern = re.compile('|'.join(map(re.escape, parts)))
+            similar_keys = [k for k, k_lower in LOWERED_KEYS if pattern.search(k_lower)]
         if similar_keys:
-            print(f"     Similar keys in JSON: {similar_keys}")
+            out.append(f"     Similar keys in JSON: {similar_keys}")
     
-    print()
\ No newline at end of file
+    out.append('')
+
+sys.stdout.write("\n".join(out) + "\n")
\ No newline at end of file
@@ -1,12 +1,59 @@
 import streamlit as st
 import json
+import math
+import html
 import pandas as pd
+import pyarrow as pa
 import io
-from typing import Any, Dict, Union
+import csv
+from typing import Any, Dict, List, Tuple, Union
 import zipfile
+import functools
+import hashlib
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import streamlit.components.v1 as components
 
+# Prefer orjson for parsing/serializing when installed, stdlib json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson silently turns integers beyond 64 bits into floats, so text with a run of 19+
+# digits is parsed by the stdlib instead. Digits are masked to b'0' and everything else
+# to b' ' so the check is one C-level translate plus a substring search
+_DIGIT_MASK = bytes(0x30 if 0x30 <= b <= 0x39 else 0x20 for b in range(256))
+_LONG_DIGIT_RUN = b'0' * 19
+
+# Excel downloads stream through xlsxwriter when installed, openpyxl otherwise
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
+
+# Large uploads are stream-parsed with ijson when installed
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# Uploads above this size are stream-parsed rather than read into memory whole
+STREAM_THRESHOLD_BYTES = 10 * 1024 * 1024
+
+# Batch workers start from a fresh interpreter (forkserver, or spawn where that is all
+# there is) rather than a fork of the multithreaded Streamlit server, which can leave a
+# child stuck on a lock another thread held. Each worker re-imports the app, which takes
+# a couple of seconds, so only batches with at least this much JSON use the pool
+BATCH_POOL_CONTEXT = multiprocessing.get_context('forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+BATCH_POOL_MIN_BYTES = 8 * 1024 * 1024
+
+# Diagnostic output (console prints and on-page notes) is opt-in via GIS_FLATTENER_DEBUG=1
+DEBUG = os.environ.get("GIS_FLATTENER_DEBUG") == "1"
+
 # Set page config
 st.set_page_config(
     page_title="GIS JSON Flattener",
@@ -15,14 +62,43 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+def load_json(content: Union[str, bytes]) -> Any:
+    """Parse JSON text, using orjson when available and it parses the text exactly like the stdlib."""
+    if orjson is not None:
+        raw = content.encode('utf-8') if isinstance(content, str) else content
+        if _LONG_DIGIT_RUN not in raw.translate(_DIGIT_MASK):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                # NaN/Infinity, which the stdlib accepts, or invalid JSON, which it reports
+                pass
+    return json.loads(content)
+
+def dump_json_pretty(data: Dict[str, Any]) -> bytes:
+    """Serialize a flat mapping as indented, non-ASCII-escaped UTF-8 JSON, using orjson when available."""
+    if orjson is not None:
+        try:
+            output = orjson.dumps(data, option=orjson.OPT_INDENT_2)
+        except orjson.JSONEncodeError:
+            # Integers beyond 64 bits, which the stdlib writes exactly
+            output = None
+        # orjson writes NaN/Infinity as null where the stdlib keeps them
+        if output is not None and not (b'null' in output and any(
+                isinstance(value, float) and not math.isfinite(value) for value in data.values())):
+            return output
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+@functools.lru_cache(maxsize=32)
 def create_clipboard_component(text_data, button_text, success_message):
     """Create a working clipboard copy component"""
     
-    # Create unique key for this component
-    component_key = f"clipboard_{abs(hash(text_data[:100]))}"
+    # Create unique key for this component from a stable hash of the full content
+    component_key = f"clipboard_{hashlib.blake2b(text_data.encode('utf-8', 'ignore'), digest_size=8).hexdigest()}"
     
-    # Escape the text data for JavaScript
-    escaped_text = text_data.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
+    # The payload sits verbatim in a hidden textarea, so it only needs HTML escaping
+    # (no JavaScript string encoding); the newline after the opening tag is the one
+    # the HTML parser drops, so a leading newline in the payload survives
+    escaped_text = html.escape(text_data, quote=False)
     
     # HTML and JavaScript for clipboard functionality
     html_code = f"""
@@ -41,11 +117,13 @@ def create_clipboard_component(text_data, button_text, success_message):
             {button_text}
         </button>
         <span id="status_{component_key}" style="margin-left: 10px; color: green; font-weight: bold;"></span>
+        <textarea id="payload_{component_key}" hidden readonly>
+{escaped_text}</textarea>
     </div>
     
     <script>
         function copyToClipboard_{component_key}() {{
-            const text = "{escaped_text}";
+            const text = document.getElementById('payload_{component_key}').value;
             
             if (navigator.clipboard) {{
                 navigator.clipboard.writeText(text).then(function() {{
@@ -65,264 +143,408 @@ def create_clipboard_component(text_data, button_text, success_message):
         }}
         
         function fallbackCopy_{component_key}(text) {{
+            // Select a one-character textarea and hand the real payload to the copy
+            // event, so large payloads never have to be inserted into the DOM
             const textArea = document.createElement('textarea');
-            textArea.value = text;
+            textArea.value = ' ';
             document.body.appendChild(textArea);
             textArea.select();
             
+            let copied = false;
+            const onCopy = function(e) {{
+                e.clipboardData.setData('text/plain', text);
+                e.preventDefault();
+                copied = true;
+            }};
+            document.addEventListener('copy', onCopy, {{ once: true }});
+            
             try {{
-                document.execCommand('copy');
+                copied = document.execCommand('copy') && copied;
+            }} catch (err) {{
+                copied = false;
+            }}
+            
+            document.removeEventListener('copy', onCopy);
+            document.body.removeChild(textArea);
+            
+            if (copied) {{
                 document.getElementById('status_{component_key}').innerHTML = '✅ {success_message}';
                 document.getElementById('copyBtn_{component_key}').innerHTML = '✅ Copied!';
                 setTimeout(() => {{
                     document.getElementById('status_{component_key}').innerHTML = '';
                     document.getElementById('copyBtn_{component_key}').innerHTML = '{button_text}';
                 }}, 3000);
-            }} catch (err) {{
+            }} else {{
+                // Only render the payload for manual selection when the copy truly failed
                 document.getElementById('status_{component_key}').innerHTML = '❌ Copy failed - select text below';
                 const preElement = document.createElement('pre');
                 preElement.style.cssText = 'border:1px solid #ccc;padding:10px;max-height:200px;overflow:auto;background:#f9f9f9;margin:10px 0;user-select:all;';
                 preElement.textContent = text;
                 document.getElementById('copyBtn_{component_key}').parentNode.appendChild(preElement);
             }}
-            
-            document.body.removeChild(textArea);
         }}
     </script>
     """
     
     return html_code
 
-def flatten_json_data(json_data: Union[str, Dict]) -> Dict[str, Any]:
+@st.cache_data(max_entries=32, show_spinner=False)
+def process_json(json_data: Union[str, bytes, Dict]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
     """
-    Flattens a JSON object (including arrays and nested objects) into a flat dictionary.
+    Walks the JSON tree once, returning the structure analysis, the flattened data and
+    the top-level fields (see top_level_fields).
     """
+    # Parse JSON if it's a string or raw bytes
+    if isinstance(json_data, (str, bytes)):
+        data = load_json(json_data)
+    else:
+        data = json_data
     
-    def flatten_dict(obj: Any, parent_key: str = '', sep: str = '_') -> Dict[str, Any]:
-        """Recursively flatten nested dictionaries and arrays."""
-        items = []
+    analysis = {
+        'arrays': [],
+        'nested_objects': [],
+        'primitive_fields': 0
+    }
+    # Leaves are collected as (key, value) pairs and turned into a dict once at the end
+    pairs = []
+    
+    # Frames are (node, flat key, analysis path, role). The role is 'member' for
+    # object values, 'sample' for the first item of an array (the analysis only
+    # looks at that one) and None for nodes the analysis skips.
+    stack = [(data, '', '', 'sample')]
+    
+    while stack:
+        obj, parent_key, path, role = stack.pop()
         
         if isinstance(obj, dict):
-            for key, value in obj.items():
-                new_key = f"{parent_key}{sep}{key}" if parent_key else key
-                items.extend(flatten_dict(value, new_key, sep).items())
-                
+            if role == 'member':
+                analysis['nested_objects'].append(path)
+            child_role = 'member' if role else None
+            
+            # Build the key/path prefixes once per object instead of per child
+            key_prefix = parent_key + '_' if parent_key else ''
+            path_prefix = path + '.' if path else ''
+            
+            # Push children in reverse so they pop in document order
+            for key in reversed(obj):
+                stack.append((
+                    obj[key],
+                    key_prefix + key,
+                    path_prefix + key if child_role else '',
+                    child_role
+                ))
+        
         elif isinstance(obj, list):
+            if role == 'member':
+                analysis['arrays'].append({
+                    'path': path,
+                    'length': len(obj),
+                    'type': 'array'
+                })
+            
             if len(obj) == 0:
-                items.append((parent_key, "[]"))
+                pairs.append((parent_key, "[]"))
             else:
-                for i, item in enumerate(obj):
-                    new_key = f"{parent_key}{sep}{i}"
-                    if isinstance(item, (dict, list)):
-                        items.extend(flatten_dict(item, new_key, sep).items())
-                    else:
-                        items.append((new_key, item))
+                key_prefix = parent_key + '_'
+                for i in range(len(obj) - 1, -1, -1):
+                    sampled = role == 'member' and i == 0
+                    stack.append((
+                        obj[i],
+                        key_prefix + str(i),
+                        path + '[0]' if sampled else '',
+                        'sample' if sampled else None
+                    ))
         else:
-            items.append((parent_key, obj))
-            
-        return dict(items)
+            if role == 'member':
+                analysis['primitive_fields'] += 1
+            pairs.append((parent_key, obj))
     
-    # Parse JSON if it's a string
-    if isinstance(json_data, str):
-        try:
-            data = json.loads(json_data)
-        except json.JSONDecodeError as e:
-            raise ValueError(f"Invalid JSON string: {e}")
-    else:
-        data = json_data
+    return analysis, dict(pairs), top_level_fields(data)
+
+@st.cache_data(max_entries=8, show_spinner=False)
+def process_json_stream(file_id: str, _stream) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """
+    Streams JSON from a file object through ijson, returning the same analysis,
+    flattened data and top-level fields as process_json without building the parsed
+    tree. Cached on the upload's file id; the stream itself isn't hashed.
+    """
+    analysis = {
+        'arrays': [],
+        'nested_objects': [],
+        'primitive_fields': 0
+    }
+    flattened = {}
+    top_level = {}
+    
+    # Open containers as [is_array, flat key, analysis path, role, next index or
+    # pending key, analysis entry]; roles follow process_json
+    frames = []
+    
+    # A top-level SEC GIS value that is itself a container is rebuilt from its events
+    builder = None
+    builder_key = None
     
-    return flatten_dict(data)
+    _stream.seek(0)
+    for _, event, value in ijson.parse(_stream, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+        
+        if event == 'map_key':
+            frames[-1][4] = value
+            continue
+        if event == 'end_map':
+            frames.pop()
+        elif event == 'end_array':
+            frame = frames.pop()
+            if frame[4] == 0:
+                flattened[frame[1]] = "[]"
+            if frame[5] is not None:
+                frame[5]['length'] = frame[4]
+        
+        if event in ('end_map', 'end_array'):
+            if builder is not None and len(frames) == 1:
+                top_level[builder_key] = builder.value
+                builder = None
+            continue
+        
+        # A value starts: work out its flat key, path and role from its container
+        if not frames:
+            flat_key, path, role = '', '', 'sample'
+        else:
+            parent = frames[-1]
+            if parent[0]:
+                index = parent[4]
+                parent[4] += 1
+                flat_key = parent[1] + '_' + str(index)
+                sampled = parent[3] == 'member' and index == 0
+                path = parent[2] + '[0]' if sampled else ''
+                role = 'sample' if sampled else None
+            else:
+                key = parent[4]
+                flat_key = parent[1] + '_' + key if parent[1] else key
+                role = 'member' if parent[3] else None
+                path = (parent[2] + '.' + key if parent[2] else key) if role else ''
+                
+                # Members of the root object are the top-level fields
+                if len(frames) == 1:
+                    top_level[key] = None
+                    if key in _SEC_GIS_LOOKUP_KEYS:
+                        if event in ('start_map', 'start_array'):
+                            builder = ijson.ObjectBuilder()
+                            builder_key = key
+                            builder.event(event, value)
+                        else:
+                            top_level[key] = value
+        
+        if event == 'start_map':
+            if role == 'member':
+                analysis['nested_objects'].append(path)
+            frames.append([False, flat_key, path, role, None, None])
+        elif event == 'start_array':
+            entry = None
+            if role == 'member':
+                # Length is filled in once the array closes
+                entry = {'path': path, 'length': 0, 'type': 'array'}
+                analysis['arrays'].append(entry)
+            frames.append([True, flat_key, path, role, 0, entry])
+        else:
+            if role == 'member':
+                analysis['primitive_fields'] += 1
+            flattened[flat_key] = value
+    
+    return analysis, flattened, top_level
 
+def flatten_json_data(json_data: Union[str, bytes, Dict]) -> Dict[str, Any]:
+    """
+    Flattens a JSON object (including arrays and nested objects) into a flat dictionary.
+    """
+    try:
+        return process_json(json_data)[1]
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Invalid JSON string: {e}")
+
+@functools.lru_cache(maxsize=8192)
 def format_field_name(field_name: str) -> str:
     """Convert snake_case field names to Title Case for better readability."""
     return field_name.replace('_', ' ').title()
 
-def analyze_json_structure(json_data: Union[str, Dict]) -> Dict[str, Any]:
+def analyze_json_structure(json_data: Union[str, bytes, Dict]) -> Dict[str, Any]:
     """Analyze the structure of JSON to understand arrays and nested objects."""
-    if isinstance(json_data, str):
-        data = json.loads(json_data)
-    else:
-        data = json_data
-    
-    def analyze_recursive(obj: Any, path: str = "") -> Dict[str, Any]:
-        analysis = {
-            'arrays': [],
-            'nested_objects': [],
-            'primitive_fields': 0
-        }
-        
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                current_path = f"{path}.{key}" if path else key
-                
-                if isinstance(value, list):
-                    analysis['arrays'].append({
-                        'path': current_path,
-                        'length': len(value),
-                        'type': 'array'
-                    })
-                    # Analyze array contents
-                    for item in value[:1]:  # Sample first item
-                        sub_analysis = analyze_recursive(item, f"{current_path}[0]")
-                        analysis['arrays'].extend(sub_analysis['arrays'])
-                        analysis['nested_objects'].extend(sub_analysis['nested_objects'])
-                        analysis['primitive_fields'] += sub_analysis['primitive_fields']
-                elif isinstance(value, dict):
-                    analysis['nested_objects'].append(current_path)
-                    sub_analysis = analyze_recursive(value, current_path)
-                    analysis['arrays'].extend(sub_analysis['arrays'])
-                    analysis['nested_objects'].extend(sub_analysis['nested_objects'])
-                    analysis['primitive_fields'] += sub_analysis['primitive_fields']
-                else:
-                    analysis['primitive_fields'] += 1
-        
-        return analysis
-    
-    return analyze_recursive(data)
+    return process_json(json_data)[0]
+
+# SEC GIS general information fields (label, JSON key) - following exact arrangement
+_SEC_GIS_HEADER_FIELDS = (
+    ("Document Type", "document_type"),
+    ("For the year", "for_the_year"),
+    ("Corporate Name", "corporate_name"),
+    ("Business/Trade Name", "business_trade_name"),
+    ("Date Registered", "date_registered"),
+    ("Fiscal Year End", "fiscal_year_end"),
+    ("SEC Registration Number", "sec_registration_number"),
+    ("Corporate TIN", "corporate_tin"),
+    ("Website/URL", "website_url"),
+    ("Principal Office Address", "principal_office_address"),
+    ("Business Address", "business_address"),
+    ("Official e-mail address", "official_email"),
+    ("Alternate Email Address", "alternate_email"),
+    ("Official Mobile Number", "official_mobile"),
+    ("Alternate Mobile Number", "alternate_mobile"),
+    ("Primary Purpose/Industry", "primary_purpose_industry"),
+    ("Industry Classification", "industry_classification"),
+    ("Geographical Code", "geographical_code"),
+    ("Parent Company Name", "parent_company_name"),
+    ("Parent Company SEC Reg. No.", "parent_company_sec_reg_no"),
+    ("Parent Company Address", "parent_company_address"),
+    ("Subsidiary/Affiliate", "subsidiary_affiliate"),
+    ("Subsidiary/Affiliate SEC Reg. No.", "subsidiary_affiliate_sec_reg_no"),
+    ("Subsidiary/Affiliate Address", "subsidiary_affiliate_address"),
+    ("External Auditor", "external_auditor"),
+    ("Auditor SEC Accreditation Number", "auditor_sec_accreditation_number"),
+    ("Covered Person (AML)", "covered_person_aml"),
+    ("AMLA Category 1", "amla_category_1"),
+    ("AMLA Category 2", "amla_category_2"),
+    ("AMLA Category 3", "amla_category_3"),
+    ("AMLA Category 4", "amla_category_4"),
+    ("AMLA Category 5", "amla_category_5"),
+    ("AMLA Category 6", "amla_category_6"),
+    ("AMLA Category 7", "amla_category_7"),
+    ("AMLA Category 8", "amla_category_8"),
+    ("AMLA Compliance Status", "amla_compliance_status"),
+    ("Auth Capital Stock - Type of Shares 1", "auth_capital_stock_type_of_shares_1"),
+    ("Auth Capital Stock - Number of Shares 1", "auth_capital_stock_number_of_shares_1"),
+    ("Auth Capital Stock - Par / Stated Value 1", "auth_capital_stock_par_stated_value_1"),
+    ("Auth Capital Stock - Amount (PhP) 1", "auth_capital_stock_amount_php_1"),
+    ("Filipino Subscribed Capital - Type of Shares 1", "filipino_subscribed_capital_type_of_shares_1"),
+    ("Filipino Subscribed Capital - Number of Shares 1", "filipino_subscribed_capital_number_of_shares_1"),
+    ("Filipino Subscribed Capital - Par / Stated Value 1", "filipino_subscribed_capital_par_stated_value_1"),
+    ("Filipino Subscribed Capital - Amount (PhP) 1", "filipino_subscribed_capital_amount_php_1"),
+    ("Foreign Subscribed Capital - Type of Shares 1", "foreign_subscribed_capital_type_of_shares_1"),
+    ("Foreign Subscribed Capital - Number of Shares 1", "foreign_subscribed_capital_number_of_shares_1"),
+    ("Foreign Subscribed Capital - Par / Stated Value 1", "foreign_subscribed_capital_par_stated_value_1"),
+    ("Foreign Subscribed Capital - Amount (PhP) 1", "foreign_subscribed_capital_amount_php_1"),
+    ("Subscribed Capital_% Foreigh Equity", "subscribed_capital_foreign_equity_percentage"),
+    ("Subscribed Capital_Total", "subscribed_capital_total"),
+    ("Filipino Paid-Up Capital - Type of Shares 1", "filipino_paid_up_capital_type_of_shares_1"),
+    ("Filipino Paid-up Capital Number of Shares 1", "filipino_paid_up_capital_number_of_shares_1"),
+    ("Filipino Paid-Up Capital - Par / Stated Value 1", "filipino_paid_up_capital_par_stated_value_1"),
+    ("Filipino Paid-Up Capital - Amount (PhP) 1", "filipino_paid_up_capital_amount_php_1"),
+    ("Foreign Paid-Up Capital - Type of Shares 1", "foreign_paid_up_capital_type_of_shares_1"),
+    ("Foreign Paid-up Capital Number of Shares 1", "foreign_paid_up_capital_number_of_shares_1"),
+    ("Foreign Paid-Up Capital - Par / Stated Value 1", "foreign_paid_up_capital_par_stated_value_1"),
+    ("Foreign Paid-Up Capital - Amount (PhP) 1", "foreign_paid_up_capital_amount_php_1"),
+    ("Paid-up Capital_% Foreigh Equity", "paid_up_capital_foreign_equity_percentage"),
+    ("Paid-Up Capital_Total", "paid_up_capital_total"),
+)
 
-def map_sec_gis_fields(json_data: Union[str, Dict]) -> Dict[str, Any]:
+# Per-entry (label suffix, JSON key part) for the numbered Director/Officer and Stockholder sections
+_DIRECTOR_OFFICER_FIELDS = (
+    ("Name", "name"),
+    ("Address", "address"),
+    ("Nationality", "nationality"),
+    ("INC'R", "inc_r"),
+    ("Board", "board"),
+    ("Gender", "gender"),
+    ("Stock Holder", "stock_holder"),
+    ("Officer", "officer"),
+    ("Exec Comm.", "exec_comm"),
+    ("TIN", "tin"),
+)
+
+_STOCKHOLDER_FIELDS = (
+    ("Name", "name"),
+    ("Nationality", "nationality"),
+    ("Address", "address"),
+    ("Total Shares Subscribed_No.", "shares_subscribed_number"),
+    ("Total Shares Subscribed_Amount (PHP)", "shares_subscribed_amount"),
+    ("% of Ownership", "ownership_percentage"),
+    ("Amount Paid (PHP)", "amount_paid"),
+    ("TIN", "tin"),
+)
+
+# Stockholder summary fields between the Director/Officer and Stockholder sections
+_SEC_GIS_STOCKHOLDER_SUMMARY_FIELDS = (
+    ("Total Number of Stockholders", "total_number_stockholders"),
+    ("Number of Stockholders with ≥100 shares", "number_stockholders_100_plus_shares"),
+    ("Total Assets (Latest Audited FS)", "total_assets"),
+)
+
+# Remaining financial and other information
+_SEC_GIS_FINANCIAL_FIELDS = (
+    ("Subscribed Capital_Total (PHP) (from Stockholder detail pages)", "subscribed_capital_total_from_stockholders"),
+    ("Paid-Up Capital_Total (PHP) (from Stockholder detail pages)", "paid_up_capital_total_from_stockholders"),
+    ("Unrestricted Retained Earnings (PHP)", "unrestricted_retained_earnings"),
+    ("Prior year Dividends_Cash (PHP)", "prior_year_dividends_cash"),
+    ("Prior year Dividends_Stock (PHP)", "prior_year_dividends_stock"),
+    ("Prior year Dividends_Property (PHP)", "prior_year_dividends_property"),
+    ("Prior year Dividends_Total (PHP)", "prior_year_dividends_total"),
+    ("Share Issuance_Date", "share_issuance_date"),
+    ("Share Issuance_No", "share_issuance_number"),
+    ("Share Issuance_Amount (PHP)", "share_issuance_amount"),
+    ("SEC License Type", "sec_license_type"),
+    ("SEC Licnese Date", "sec_license_date"),
+    ("SEC Ops start", "sec_ops_start"),
+    ("BSP License Type", "bsp_license_type"),
+    ("BSP Licnese Date", "bsp_license_date"),
+    ("BSP Ops start", "bsp_ops_start"),
+    ("IC License Type", "ic_license_type"),
+    ("IC Licnese Date", "ic_license_date"),
+    ("IC Ops start", "ic_ops_start"),
+    ("Total Comp (PHP)", "total_compensation"),
+    ("No Officers", "number_officers"),
+    ("No Employees", "number_employees"),
+    ("Total Manpower", "total_manpower"),
+    ("UBO_Name", "ubo_name"),
+    ("UBO_Address", "ubo_address"),
+    ("UBO_Naitonality", "ubo_nationality"),
+    ("UBO_DOB", "ubo_dob"),
+    ("UBO_TIN", "ubo_tin"),
+    ("UBO_% ownership", "ubo_ownership_percentage"),
+    ("UBO_Type", "ubo_type"),
+    ("UBO_Category", "ubo_category"),
+)
+
+# Full SEC GIS layout built once at import: up to 20 Directors/Officers and
+# 10 Stockholders as per the Pydantic model
+SEC_GIS_FIELDS = (
+    _SEC_GIS_HEADER_FIELDS
+    + tuple(
+        (f"Director/Officer {i} {label}", f"director_officer_{key}_{i}")
+        for i in range(1, 21)
+        for label, key in _DIRECTOR_OFFICER_FIELDS
+    )
+    + _SEC_GIS_STOCKHOLDER_SUMMARY_FIELDS
+    + tuple(
+        (f"Stockholder {i} {label}", f"stockholder_{key}_{i}")
+        for i in range(1, 11)
+        for label, key in _STOCKHOLDER_FIELDS
+    )
+    + _SEC_GIS_FINANCIAL_FIELDS
+)
+
+# Top-level keys whose presence marks input as SEC GIS data, in reporting order,
+# plus a set for the plain yes/no check
+_SEC_GIS_DETECTION_KEYS = ('corporate_name', 'sec_registration_number', 'director_officer_name_1', 'business_trade_name', 'document_type')
+_SEC_GIS_KEYS = frozenset(_SEC_GIS_DETECTION_KEYS)
+
+# Every top-level key SEC GIS detection or mapping reads
+_SEC_GIS_LOOKUP_KEYS = frozenset(key for _, key in SEC_GIS_FIELDS) | _SEC_GIS_KEYS
+
+def top_level_fields(data: Any) -> Dict[str, Any]:
     """
-    Maps JSON data to SEC GIS field format
+    Returns the top-level keys of parsed JSON, with their values kept only for the keys
+    SEC GIS detection and mapping read. Others map to None, which maps like a missing key.
+    """
+    if not isinstance(data, dict):
+        return {}
+    return {key: (value if key in _SEC_GIS_LOOKUP_KEYS else None) for key, value in data.items()}
+
+def map_sec_gis_fields(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Maps top-level JSON data to SEC GIS field format
     """
-    if isinstance(json_data, str):
-        data = json.loads(json_data)
-    else:
-        data = json_data
-    
-    # SEC GIS Field mapping - following exact arrangement
-    field_mapping = {
-        "Document Type": data.get("document_type", ""),
-        "For the year": data.get("for_the_year", ""),
-        "Corporate Name": data.get("corporate_name", ""),
-        "Business/Trade Name": data.get("business_trade_name", ""),
-        "Date Registered": data.get("date_registered", ""),
-        "Fiscal Year End": data.get("fiscal_year_end", ""),
-        "SEC Registration Number": data.get("sec_registration_number", ""),
-        "Corporate TIN": data.get("corporate_tin", ""),
-        "Website/URL": data.get("website_url", ""),
-        "Principal Office Address": data.get("principal_office_address", ""),
-        "Business Address": data.get("business_address", ""),
-        "Official e-mail address": data.get("official_email", ""),
-        "Alternate Email Address": data.get("alternate_email", ""),
-        "Official Mobile Number": data.get("official_mobile", ""),
-        "Alternate Mobile Number": data.get("alternate_mobile", ""),
-        "Primary Purpose/Industry": data.get("primary_purpose_industry", ""),
-        "Industry Classification": data.get("industry_classification", ""),
-        "Geographical Code": data.get("geographical_code", ""),
-        "Parent Company Name": data.get("parent_company_name", ""),
-        "Parent Company SEC Reg. No.": data.get("parent_company_sec_reg_no", ""),
-        "Parent Company Address": data.get("parent_company_address", ""),
-        "Subsidiary/Affiliate": data.get("subsidiary_affiliate", ""),
-        "Subsidiary/Affiliate SEC Reg. No.": data.get("subsidiary_affiliate_sec_reg_no", ""),
-        "Subsidiary/Affiliate Address": data.get("subsidiary_affiliate_address", ""),
-        "External Auditor": data.get("external_auditor", ""),
-        "Auditor SEC Accreditation Number": data.get("auditor_sec_accreditation_number", ""),
-        "Covered Person (AML)": data.get("covered_person_aml", ""),
-        "AMLA Category 1": data.get("amla_category_1", ""),
-        "AMLA Category 2": data.get("amla_category_2", ""),
-        "AMLA Category 3": data.get("amla_category_3", ""),
-        "AMLA Category 4": data.get("amla_category_4", ""),
-        "AMLA Category 5": data.get("amla_category_5", ""),
-        "AMLA Category 6": data.get("amla_category_6", ""),
-        "AMLA Category 7": data.get("amla_category_7", ""),
-        "AMLA Category 8": data.get("amla_category_8", ""),
-        "AMLA Compliance Status": data.get("amla_compliance_status", ""),
-        "Corporate Name": data.get("corporate_name", ""),
-        "Auth Capital Stock - Type of Shares 1": data.get("auth_capital_stock_type_of_shares_1", ""),
-        "Auth Capital Stock - Number of Shares 1": data.get("auth_capital_stock_number_of_shares_1", ""),
-        "Auth Capital Stock - Par / Stated Value 1": data.get("auth_capital_stock_par_stated_value_1", ""),
-        "Auth Capital Stock - Amount (PhP) 1": data.get("auth_capital_stock_amount_php_1", ""),
-        "Filipino Subscribed Capital - Type of Shares 1": data.get("filipino_subscribed_capital_type_of_shares_1", ""),
-        "Filipino Subscribed Capital - Number of Shares 1": data.get("filipino_subscribed_capital_number_of_shares_1", ""),
-        "Filipino Subscribed Capital - Par / Stated Value 1": data.get("filipino_subscribed_capital_par_stated_value_1", ""),
-        "Filipino Subscribed Capital - Amount (PhP) 1": data.get("filipino_subscribed_capital_amount_php_1", ""),
-        "Foreign Subscribed Capital - Type of Shares 1": data.get("foreign_subscribed_capital_type_of_shares_1", ""),
-        "Foreign Subscribed Capital - Number of Shares 1": data.get("foreign_subscribed_capital_number_of_shares_1", ""),
-        "Foreign Subscribed Capital - Par / Stated Value 1": data.get("foreign_subscribed_capital_par_stated_value_1", ""),
-        "Foreign Subscribed Capital - Amount (PhP) 1": data.get("foreign_subscribed_capital_amount_php_1", ""),
-        "Subscribed Capital_% Foreigh Equity": data.get("subscribed_capital_foreign_equity_percentage", ""),
-        "Subscribed Capital_Total": data.get("subscribed_capital_total", ""),
-        "Filipino Paid-Up Capital - Type of Shares 1": data.get("filipino_paid_up_capital_type_of_shares_1", ""),
-        "Filipino Paid-up Capital Number of Shares 1": data.get("filipino_paid_up_capital_number_of_shares_1", ""),
-        "Filipino Paid-Up Capital - Par / Stated Value 1": data.get("filipino_paid_up_capital_par_stated_value_1", ""),
-        "Filipino Paid-Up Capital - Amount (PhP) 1": data.get("filipino_paid_up_capital_amount_php_1", ""),
-        "Foreign Paid-Up Capital - Type of Shares 1": data.get("foreign_paid_up_capital_type_of_shares_1", ""),
-        "Foreign Paid-up Capital Number of Shares 1": data.get("foreign_paid_up_capital_number_of_shares_1", ""),
-        "Foreign Paid-Up Capital - Par / Stated Value 1": data.get("foreign_paid_up_capital_par_stated_value_1", ""),
-        "Foreign Paid-Up Capital - Amount (PhP) 1": data.get("foreign_paid_up_capital_amount_php_1", ""),
-        "Paid-up Capital_% Foreigh Equity": data.get("paid_up_capital_foreign_equity_percentage", ""),
-        "Paid-Up Capital_Total": data.get("paid_up_capital_total", ""),
-    }
-    
-    # Add Directors/Officers - up to 20 entries as per Pydantic model
-    for i in range(1, 21):  # 1-20 Director/Officer entries
-        field_mapping[f"Director/Officer {i} Name"] = data.get(f"director_officer_name_{i}", "")
-        field_mapping[f"Director/Officer {i} Address"] = data.get(f"director_officer_address_{i}", "")
-        field_mapping[f"Director/Officer {i} Nationality"] = data.get(f"director_officer_nationality_{i}", "")
-        field_mapping[f"Director/Officer {i} INC'R"] = data.get(f"director_officer_inc_r_{i}", "")
-        field_mapping[f"Director/Officer {i} Board"] = data.get(f"director_officer_board_{i}", "")
-        field_mapping[f"Director/Officer {i} Gender"] = data.get(f"director_officer_gender_{i}", "")
-        field_mapping[f"Director/Officer {i} Stock Holder"] = data.get(f"director_officer_stock_holder_{i}", "")
-        field_mapping[f"Director/Officer {i} Officer"] = data.get(f"director_officer_officer_{i}", "")
-        field_mapping[f"Director/Officer {i} Exec Comm."] = data.get(f"director_officer_exec_comm_{i}", "")
-        field_mapping[f"Director/Officer {i} TIN"] = data.get(f"director_officer_tin_{i}", "")
-    
-    # Continue with remaining fields
-    field_mapping.update({
-        "Total Number of Stockholders": data.get("total_number_stockholders", ""),
-        "Number of Stockholders with ≥100 shares": data.get("number_stockholders_100_plus_shares", ""),
-        "Total Assets (Latest Audited FS)": data.get("total_assets", ""),
-    })
-    
-    # Add Stockholders - up to 10 entries as per Pydantic model
-    for i in range(1, 11):  # 1-10 Stockholder entries
-        field_mapping[f"Stockholder {i} Name"] = data.get(f"stockholder_name_{i}", "")
-        field_mapping[f"Stockholder {i} Nationality"] = data.get(f"stockholder_nationality_{i}", "")
-        field_mapping[f"Stockholder {i} Address"] = data.get(f"stockholder_address_{i}", "")
-        field_mapping[f"Stockholder {i} Total Shares Subscribed_No."] = data.get(f"stockholder_shares_subscribed_number_{i}", "")
-        field_mapping[f"Stockholder {i} Total Shares Subscribed_Amount (PHP)"] = data.get(f"stockholder_shares_subscribed_amount_{i}", "")
-        field_mapping[f"Stockholder {i} % of Ownership"] = data.get(f"stockholder_ownership_percentage_{i}", "")
-        field_mapping[f"Stockholder {i} Amount Paid (PHP)"] = data.get(f"stockholder_amount_paid_{i}", "")
-        field_mapping[f"Stockholder {i} TIN"] = data.get(f"stockholder_tin_{i}", "")
-    
-    # Add remaining financial and other information
-    field_mapping.update({
-        "Subscribed Capital_Total (PHP) (from Stockholder detail pages)": data.get("subscribed_capital_total_from_stockholders", ""),
-        "Paid-Up Capital_Total (PHP) (from Stockholder detail pages)": data.get("paid_up_capital_total_from_stockholders", ""),
-        "Unrestricted Retained Earnings (PHP)": data.get("unrestricted_retained_earnings", ""),
-        "Prior year Dividends_Cash (PHP)": data.get("prior_year_dividends_cash", ""),
-        "Prior year Dividends_Stock (PHP)": data.get("prior_year_dividends_stock", ""),
-        "Prior year Dividends_Property (PHP)": data.get("prior_year_dividends_property", ""),
-        "Prior year Dividends_Total (PHP)": data.get("prior_year_dividends_total", ""),
-        "Share Issuance_Date": data.get("share_issuance_date", ""),
-        "Share Issuance_No": data.get("share_issuance_number", ""),
-        "Share Issuance_Amount (PHP)": data.get("share_issuance_amount", ""),
-        "SEC License Type": data.get("sec_license_type", ""),
-        "SEC Licnese Date": data.get("sec_license_date", ""),
-        "SEC Ops start": data.get("sec_ops_start", ""),
-        "BSP License Type": data.get("bsp_license_type", ""),
-        "BSP Licnese Date": data.get("bsp_license_date", ""),
-        "BSP Ops start": data.get("bsp_ops_start", ""),
-        "IC License Type": data.get("ic_license_type", ""),
-        "IC Licnese Date": data.get("ic_license_date", ""),
-        "IC Ops start": data.get("ic_ops_start", ""),
-        "Total Comp (PHP)": data.get("total_compensation", ""),
-        "No Officers": data.get("number_officers", ""),
-        "No Employees": data.get("number_employees", ""),
-        "Total Manpower": data.get("total_manpower", ""),
-        "UBO_Name": data.get("ubo_name", ""),
-        "UBO_Address": data.get("ubo_address", ""),
-        "UBO_Naitonality": data.get("ubo_nationality", ""),
-        "UBO_DOB": data.get("ubo_dob", ""),
-        "UBO_TIN": data.get("ubo_tin", ""),
-        "UBO_% ownership": data.get("ubo_ownership_percentage", ""),
-        "UBO_Type": data.get("ubo_type", ""),
-        "UBO_Category": data.get("ubo_category", ""),
-    })
-    
-    # Clean null values
     cleaned_mapping = {}
-    for field, value in field_mapping.items():
+    for field, key in SEC_GIS_FIELDS:
+        value = data.get(key, "")
         if value is None or str(value).lower() == "null":
             cleaned_mapping[field] = ""
         else:
@@ -330,88 +552,366 @@ def map_sec_gis_fields(json_data: Union[str, Dict]) -> Dict[str, Any]:
     
     return cleaned_mapping
 
+def write_delimited(field_rows: list, delimiter: str) -> str:
+    """Write Field/Value rows straight through csv.writer."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter, lineterminator='\n')
+    writer.writerow(('Field', 'Value'))
+    writer.writerows(field_rows)
+    return buffer.getvalue()
+
+def format_field_rows(flattened_data: Dict[str, Any]) -> list:
+    """Build Field/Value rows with formatted field names and 'null' for missing values."""
+    return [
+        (format_field_name(field), str(value) if value is not None else 'null')
+        for field, value in flattened_data.items()
+    ]
+
+def preview_table(field_rows: list, limit: int = 10) -> pa.Table:
+    """Build the preview straight from the first Field/Value rows as an Arrow table."""
+    head = field_rows[:limit]
+    return pa.table({
+        'Field': [field for field, _ in head],
+        'Value': [value for _, value in head]
+    })
+
+def create_text_files(flattened_data: Dict[str, Any], rows: list = None) -> Dict[str, Any]:
+    """Create the TSV, CSV and JSON exports without building any DataFrames."""
+    # The formatted field names also key the JSON export
+    if rows is None:
+        rows = format_field_rows(flattened_data)
+    
+    return {
+        'tsv': write_delimited(rows, '\t'),
+        'csv': write_delimited(rows, ','),
+        # JSON content (flattened)
+        'json': dump_json_pretty(dict(zip((field for field, _ in rows), flattened_data.values())))
+    }
+
 def create_download_files(flattened_data: Dict[str, Any], filename_base: str, sec_gis_data: Dict[str, Any] = None):
     """Create downloadable files in different formats."""
     
     # Debug logging
-    print(f"DEBUG: create_download_files called with sec_gis_data: {sec_gis_data is not None}")
-    if sec_gis_data:
-        print(f"DEBUG: SEC GIS data has {len(sec_gis_data)} fields")
+    if DEBUG:
+        print(f"DEBUG: create_download_files called with sec_gis_data: {sec_gis_data is not None}")
+        if sec_gis_data:
+            print(f"DEBUG: SEC GIS data has {len(sec_gis_data)} fields")
     
-    # Create DataFrame for standard flattened data
-    df = pd.DataFrame([
-        {'Field': format_field_name(field), 'Value': str(value) if value is not None else 'null'}
-        for field, value in flattened_data.items()
-    ])
+    # Build the Field/Value rows once; they feed the DataFrames, the text exports and
+    # the formatted keys of the JSON export
+    rows = format_field_rows(flattened_data)
+    df = pd.DataFrame(rows, columns=['Field', 'Value'])
     
-    # Create DataFrame for SEC GIS format if provided
+    # Create rows and DataFrame for SEC GIS format if provided
+    sec_gis_rows = None
     sec_gis_df = None
     if sec_gis_data:
-        sec_gis_df = pd.DataFrame([
-            {'Field': field, 'Value': str(value) if value is not None else ''}
+        sec_gis_rows = [
+            (field, str(value) if value is not None else '')
             for field, value in sec_gis_data.items()
-        ])
-        print(f"DEBUG: SEC GIS DataFrame created with {len(sec_gis_df)} rows")
+        ]
+        sec_gis_df = pd.DataFrame(sec_gis_rows, columns=['Field', 'Value'])
+        if DEBUG:
+            print(f"DEBUG: SEC GIS DataFrame created with {len(sec_gis_df)} rows")
     
-    # TSV content
-    tsv_content = df.to_csv(sep='\t', index=False)
-    sec_gis_tsv = sec_gis_df.to_csv(sep='\t', index=False) if sec_gis_df is not None else None
-    
-    # CSV content  
-    csv_content = df.to_csv(index=False)
-    sec_gis_csv = sec_gis_df.to_csv(index=False) if sec_gis_df is not None else None
-    
-    # Excel content - with error handling
-    excel_content = None
-    sec_gis_excel = None
-    try:
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Flattened_Data', index=False)
-            if sec_gis_df is not None:
-                sec_gis_df.to_excel(writer, sheet_name='SEC_GIS_Format', index=False)
-        excel_content = excel_buffer.getvalue()
-        
-        if sec_gis_df is not None:
-            sec_gis_excel_buffer = io.BytesIO()
-            with pd.ExcelWriter(sec_gis_excel_buffer, engine='openpyxl') as writer:
-                sec_gis_df.to_excel(writer, sheet_name='SEC_GIS_Format', index=False)
-            sec_gis_excel = sec_gis_excel_buffer.getvalue()
-            print("DEBUG: SEC GIS Excel created successfully")
-            
-    except ImportError:
-        # If openpyxl is not available, create a simple Excel-compatible CSV
-        excel_content = csv_content.encode('utf-8')
-        sec_gis_excel = sec_gis_csv.encode('utf-8') if sec_gis_csv else None
-        print("DEBUG: Using fallback Excel format (CSV)")
-    
-    # JSON content (flattened)
-    json_content = json.dumps({
-        format_field_name(field): value for field, value in flattened_data.items()
-    }, indent=2, ensure_ascii=False)
-    
-    result = {
-        'tsv': tsv_content,
-        'csv': csv_content, 
-        'excel': excel_content,
-        'json': json_content,
-        'dataframe': df
-    }
+    # TSV, CSV and JSON content
+    result = create_text_files(flattened_data, rows)
+    result.update({
+        'dataframe': df,
+        # 10-row previews, built once with the files as Arrow tables that st.dataframe
+        # takes without a pandas conversion
+        'preview': preview_table(rows)
+    })
     
     # Add SEC GIS formats if available
     if sec_gis_data and sec_gis_df is not None:
         result.update({
-            'sec_gis_tsv': sec_gis_tsv,
-            'sec_gis_csv': sec_gis_csv,
-            'sec_gis_excel': sec_gis_excel,
-            'sec_gis_dataframe': sec_gis_df
+            'sec_gis_tsv': write_delimited(sec_gis_rows, '\t'),
+            'sec_gis_csv': write_delimited(sec_gis_rows, ','),
+            'sec_gis_dataframe': sec_gis_df,
+            'sec_gis_preview': preview_table(sec_gis_rows)
         })
-        print(f"DEBUG: Added SEC GIS data to result. Keys: {list(result.keys())}")
-    else:
+        if DEBUG:
+            print(f"DEBUG: Added SEC GIS data to result. Keys: {list(result.keys())}")
+    elif DEBUG:
         print("DEBUG: No SEC GIS data added to result")
     
     return result
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_download_files(source: Union[str, bytes], filename_base: str, with_sec_gis: bool, _flattened: Dict[str, Any], _top_level: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Builds the SEC GIS mapping (when requested) and the download files for flattened data.
+    Cached on its source - the raw JSON input, or the file id of a streamed upload - which
+    hashes far cheaper than the flattened dict.
+    """
+    sec_gis_data = map_sec_gis_fields(_top_level) if with_sec_gis else None
+    return sec_gis_data, create_download_files(_flattened, filename_base, sec_gis_data)
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_xlsx(df: pd.DataFrame = None, sec_gis_df: pd.DataFrame = None) -> bytes:
+    """Build an Excel workbook on demand from the standard and/or SEC GIS DataFrames."""
+    sheets = [
+        (sheet_name, frame)
+        for sheet_name, frame in (('Flattened_Data', df), ('SEC_GIS_Format', sec_gis_df))
+        if frame is not None
+    ]
+    excel_buffer = io.BytesIO()
+    
+    if xlsxwriter is not None:
+        # Stream rows out in constant-memory mode. Rows are written strictly in order,
+        # which that mode requires (pandas' to_excel writes column by column)
+        workbook = xlsxwriter.Workbook(excel_buffer, {
+            'constant_memory': True,
+            'strings_to_urls': False,
+            'strings_to_formulas': False
+        })
+        for sheet_name, frame in sheets:
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, list(frame.columns))
+            for row_number, row in enumerate(frame.itertuples(index=False, name=None), start=1):
+                worksheet.write_row(row_number, 0, row)
+        workbook.close()
+    else:
+        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+            for sheet_name, frame in sheets:
+                frame.to_excel(writer, sheet_name=sheet_name, index=False)
+    
+    return excel_buffer.getvalue()
+
+def process_batch_file(filename: str, raw: bytes) -> Dict[str, Any]:
+    """Flatten one uploaded batch file; runs in a worker process."""
+    try:
+        flattened = flatten_json_data(raw)
+        return {
+            'filename': filename,
+            'flattened_data': flattened,
+            'files': create_text_files(flattened),
+            'status': 'success',
+            'fields_count': len(flattened)
+        }
+    except Exception as e:
+        return {
+            'filename': filename,
+            'status': 'error',
+            'error': str(e)
+        }
+
+def process_batch(payloads: List[Tuple[str, bytes]], progress_bar) -> List[Dict[str, Any]]:
+    """Flatten batch files across worker processes, redoing in-process whatever the pool can't."""
+    results = [None] * len(payloads)
+    done = 0
+    
+    def advance():
+        nonlocal done
+        done += 1
+        progress_bar.progress(done / len(payloads))
+    
+    # Single files, small batches and single-CPU hosts are cheaper to flatten in-process
+    workers = min(len(payloads), os.cpu_count() or 1)
+    if workers > 1 and sum(len(raw) for _, raw in payloads) >= BATCH_POOL_MIN_BYTES:
+        # A pool may be unavailable here (no process support, a spawn failure) or break
+        # mid-batch when a worker dies; results already back are kept either way
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=BATCH_POOL_CONTEXT) as executor:
+                futures = {}
+                try:
+                    for i, (name, raw) in enumerate(payloads):
+                        futures[executor.submit(process_batch_file, name, raw)] = i
+                except (OSError, BrokenProcessPool):
+                    pass
+                for future in as_completed(futures):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception:
+                        # process_batch_file reports its own errors, so this is the pool
+                        # failing (a dead worker, unpicklable work); redo it below
+                        continue
+                    advance()
+        except (OSError, BrokenProcessPool, NotImplementedError):
+            pass
+    
+    for i, (name, raw) in enumerate(payloads):
+        if results[i] is None:
+            results[i] = process_batch_file(name, raw)
+            advance()
+    
+    return results
+
+@st.fragment
+def render_results(files: Dict[str, Any], base_filename: str, sec_gis_data: Dict[str, Any], excel_available: bool, key_prefix: str):
+    """Render the format switch, preview and copy/download options shared by the upload and paste tabs."""
+    # Excel workbooks are only built when a download is clicked; the
+    # standard workbook also carries the SEC GIS sheet when present
+    both_excel = functools.partial(build_xlsx, files['dataframe'], files.get('sec_gis_dataframe')) if excel_available else None
+    
+    # Format Selection - Simple approach without complex state management
+    if sec_gis_data and 'sec_gis_tsv' in files and files['sec_gis_tsv']:
+        st.info("🏢 SEC GIS format detected! Choose your preferred format:")
+        
+        # Simple radio selection - default to SEC GIS format
+        format_choice = st.radio(
+            "Choose format:",
+            ["📊 Standard Format", "🏢 SEC GIS Format"],
+            horizontal=True,
+            index=1,  # Default to SEC GIS Format (index 1)
+            key=f"{key_prefix}_format"
+        )
+        
+        # Set active data based on current selection (no session state needed)
+        if format_choice == "🏢 SEC GIS Format":
+            active_tsv = files['sec_gis_tsv']
+            active_csv = files['sec_gis_csv'] 
+            active_excel = functools.partial(build_xlsx, sec_gis_df=files['sec_gis_dataframe']) if excel_available else None
+            active_df = files['sec_gis_dataframe']
+            format_desc = "SEC GIS"
+            st.success("✅ **SEC GIS Format Active** - Philippine SEC compliance ready!")
+        else:
+            active_tsv = files['tsv']
+            active_csv = files['csv']
+            active_excel = both_excel
+            active_df = files['dataframe']
+            format_desc = "Standard"
+            st.info("ℹ️ **Standard Format Active** - Technical JSON field names")
+    else:
+        # No SEC GIS data available, use standard format only
+        active_tsv = files['tsv']
+        active_csv = files['csv']
+        active_excel = both_excel
+        active_df = files['dataframe']
+        format_desc = "Standard"
+        st.info("ℹ️ **Standard Format** - No SEC GIS data detected")
+    
+    # Show current format metrics
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Total Fields", len(active_df))
+    with col2:
+        st.metric("Current Format", format_desc)
+    with col3:
+        if format_desc == "SEC GIS":
+            st.metric("Compliance", "Philippine SEC ✓")
+        else:
+            st.metric("Type", "Technical")
+    
+    # Preview
+    st.write(f"**📋 Preview ({format_desc} Format):**")
+    st.dataframe(files['sec_gis_preview' if format_desc == "SEC GIS" else 'preview'], use_container_width=True)
+    
+    if len(active_df) > 10:
+        st.caption(f"Showing first 10 rows. Total: {len(active_df)} rows")
+    
+    # Show field name examples
+    if sec_gis_data:
+        with st.expander("🔍 Compare field name formats"):
+            ex_col1, ex_col2 = st.columns(2)
+            with ex_col1:
+                st.write("**📊 Standard Format:**")
+                st.code("corporate_name")
+                st.code("directors_officers_0_name") 
+                st.code("sec_registration_number")
+            with ex_col2:
+                st.write("**🏢 SEC GIS Format:**")
+                st.code("Corporate Name")
+                st.code("Director/Officer 1 Name")
+                st.code("SEC Registration Number")
+    
+    # Download and Copy Options
+    st.subheader(f"⬇️ Download & Copy Options - {format_desc} Format")
+    
+    # One-click copy buttons
+    st.write("**📋 One-Click Copy to Clipboard:**")
+    
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # TSV Copy Button
+        st.write("**📝 TSV Format (Perfect for Excel):**")
+        tsv_component = create_clipboard_component(
+            active_tsv, 
+            "📝 Copy", 
+            f"{format_desc} Copied to clipboard!"
+        )
+        components.html(tsv_component, height=70)
+        
+        st.write("")
+    
+    
+    
+    st.write("---")  # Divider
+    
+    # Download buttons section - clicks don't rerun the script (on_click="ignore")
+    st.write(f"**💾 Download Files ({format_desc} Format):**")
+    col1, col2, col3, col4 = st.columns(4)
+    
+    suffix = "_sec_gis" if format_desc == "SEC GIS" else ""
+    
+    with col1:
+        st.download_button(
+            label="📝 Download TSV",
+            data=active_tsv,
+            file_name=f"{base_filename}{suffix}_flattened.tsv",
+            mime="text/tab-separated-values",
+            on_click="ignore"
+        )
+    
+    with col2:
+        st.download_button(
+            label="📄 Download CSV", 
+            data=active_csv,
+            file_name=f"{base_filename}{suffix}_flattened.csv",
+            mime="text/csv",
+            on_click="ignore"
+        )
+    
+    with col3:
+        try:
+            if active_excel:
+                st.download_button(
+                    label="📊 Download Excel",
+                    data=active_excel,
+                    file_name=f"{base_filename}{suffix}_flattened.xlsx",
+                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    on_click="ignore"
+                )
+            else:
+                st.download_button(
+                    label="📊 Download CSV (Excel)",
+                    data=active_csv,
+                    file_name=f"{base_filename}{suffix}_flattened.csv",
+                    mime="text/csv",
+                    help="Excel format not available - downloading as CSV",
+                    on_click="ignore"
+                )
+        except:
+            st.download_button(
+                label="📊 Download CSV (Excel)",
+                data=active_csv,
+                file_name=f"{base_filename}{suffix}_flattened.csv",
+                mime="text/csv",
+                help="Excel format not available - downloading as CSV",
+                on_click="ignore"
+            )
+    
+    with col4:
+        if format_desc == "Standard" or format_desc == "Standard (Fallback)":
+            st.download_button(
+                label="🔧 Download JSON",
+                data=files['json'],
+                file_name=f"{base_filename}_flattened.json", 
+                mime="application/json",
+                on_click="ignore"
+            )
+        else:
+            st.download_button(
+                label="🏢 Both Formats",
+                data=both_excel if both_excel else files['csv'].encode('utf-8'),
+                file_name=f"{base_filename}_both_formats.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                help="Downloads both standard and SEC GIS formats in one Excel file",
+                on_click="ignore"
+            )
+
 def main():
     """Main Streamlit app."""
     
@@ -419,12 +919,13 @@ def main():
     st.title("📊 GIS JSON Flattener")
     st.markdown("Convert nested JSON data (including arrays and objects) into flat spreadsheet format")
     
-    # Check for missing dependencies
+    # Check for missing dependencies - either Excel engine will do
     try:
         import openpyxl
         excel_available = True
     except ImportError:
-        excel_available = False
+        excel_available = xlsxwriter is not None
+    if not excel_available:
         st.warning("⚠️ Excel export requires openpyxl. Add 'openpyxl>=3.1.0' to requirements.txt for full functionality. TSV and CSV work perfectly!")
     
     # Sidebar
@@ -490,9 +991,15 @@ def main():
         
         if uploaded_file is not None:
             try:
-                # Read the file
-                content = uploaded_file.read().decode('utf-8')
-                json_data = json.loads(content)
+                # One walk yields both the analysis and the flattened data. Large files
+                # are streamed and keyed by file id; otherwise the raw bytes are parsed
+                # directly and key the caches
+                if ijson is not None and uploaded_file.size > STREAM_THRESHOLD_BYTES:
+                    source = uploaded_file.file_id
+                    analysis, flattened, top_level = process_json_stream(source, uploaded_file)
+                else:
+                    source = uploaded_file.getvalue()
+                    analysis, flattened, top_level = process_json(source)
                 
                 # Display file info
                 st.success(f"✅ Successfully loaded: **{uploaded_file.name}**")
@@ -501,7 +1008,6 @@ def main():
                 
                 with col1:
                     st.subheader("📊 Structure Analysis")
-                    analysis = analyze_json_structure(json_data)
                     
                     st.metric("Arrays Found", len(analysis['arrays']))
                     st.metric("Nested Objects", len(analysis['nested_objects']))
@@ -519,44 +1025,43 @@ def main():
                     
                     if st.button("🚀 Flatten JSON", type="primary"):
                         with st.spinner("Flattening JSON data..."):
-                            # Flatten the data
-                            flattened = flatten_json_data(json_data)
-                            
                             # Check if this looks like SEC GIS data
-                            sec_gis_data = None
-                            detection_keys = ['corporate_name', 'sec_registration_number', 'director_officer_name_1', 'business_trade_name', 'document_type']
-                            found_keys = [key for key in detection_keys if key in json_data]
+                            found_keys = [key for key in _SEC_GIS_DETECTION_KEYS if key in top_level]
+                            
+                            if DEBUG:
+                                st.write(f"**DEBUG**: Looking for SEC GIS keys: {list(_SEC_GIS_DETECTION_KEYS)}")
+                                st.write(f"**DEBUG**: Found keys in JSON: {found_keys}")
+                                st.write(f"**DEBUG**: All JSON keys: {list(top_level.keys())}")
                             
-                            st.write(f"**DEBUG**: Looking for SEC GIS keys: {detection_keys}")
-                            st.write(f"**DEBUG**: Found keys in JSON: {found_keys}")
-                            st.write(f"**DEBUG**: All JSON keys: {list(json_data.keys())}")
+                            # Create download files (and the SEC GIS mapping when detected)
+                            sec_gis_data, files = build_download_files(source, uploaded_file.name.replace('.json', ''), bool(found_keys), flattened, top_level)
                             
                             if found_keys:
                                 st.info(f"🏢 SEC GIS detection successful! Found keys: {found_keys}")
-                                sec_gis_data = map_sec_gis_fields(json_data)
-                                st.write(f"**DEBUG**: SEC GIS data generated with {len(sec_gis_data)} fields")
-                                
-                                # Show first few SEC GIS fields for debugging
-                                with st.expander("**DEBUG**: View first 5 SEC GIS fields"):
-                                    first_5 = dict(list(sec_gis_data.items())[:5])
-                                    for k, v in first_5.items():
-                                        st.write(f"- **{k}**: {v}")
-                            else:
+                                if DEBUG:
+                                    st.write(f"**DEBUG**: SEC GIS data generated with {len(sec_gis_data)} fields")
+                                    
+                                    # Show first few SEC GIS fields for debugging
+                                    with st.expander("**DEBUG**: View first 5 SEC GIS fields"):
+                                        first_5 = dict(list(sec_gis_data.items())[:5])
+                                        for k, v in first_5.items():
+                                            st.write(f"- **{k}**: {v}")
+                            elif DEBUG:
                                 st.write("**DEBUG**: No SEC GIS detection keys found - using standard format only")
-                            # Create download files
-                            files = create_download_files(flattened, uploaded_file.name.replace('.json', ''), sec_gis_data)
                             
-                            st.write(f"**DEBUG**: Files dict keys: {list(files.keys())}")
+                            if DEBUG:
+                                st.write(f"**DEBUG**: Files dict keys: {list(files.keys())}")
                             
                             st.success(f"✅ Flattened into **{len(flattened)} fields**")
                             if sec_gis_data:
                                 st.success(f"📋 SEC GIS format: **{len(sec_gis_data)} Philippine SEC fields**")
                                 # Debug check
-                                if 'sec_gis_tsv' in files:
-                                    st.write("**DEBUG**: SEC GIS TSV data created successfully")
-                                    st.write(f"**DEBUG**: SEC GIS TSV length: {len(files['sec_gis_tsv']) if files['sec_gis_tsv'] else 0}")
-                                else:
-                                    st.error("**DEBUG**: SEC GIS TSV data not found in files")
+                                if DEBUG:
+                                    if 'sec_gis_tsv' in files:
+                                        st.write("**DEBUG**: SEC GIS TSV data created successfully")
+                                        st.write(f"**DEBUG**: SEC GIS TSV length: {len(files['sec_gis_tsv']) if files['sec_gis_tsv'] else 0}")
+                                    else:
+                                        st.error("**DEBUG**: SEC GIS TSV data not found in files")
                             
                             # Store in session state
                             st.session_state['flattened_data'] = flattened
@@ -572,164 +1077,8 @@ def main():
                     base_filename = st.session_state['filename'].replace('.json', '')
                     sec_gis_data = st.session_state.get('sec_gis_data')
                     
-                    # Format Selection - Simple approach without complex state management
-                    if sec_gis_data and 'sec_gis_tsv' in files and files['sec_gis_tsv']:
-                        st.info("🏢 SEC GIS format detected! Choose your preferred format:")
-                        
-                        # Simple radio selection - default to SEC GIS format
-                        format_choice = st.radio(
-                            "Choose format:",
-                            ["📊 Standard Format", "🏢 SEC GIS Format"],
-                            horizontal=True,
-                            index=1  # Default to SEC GIS Format (index 1)
-                        )
-                        
-                        # Set active data based on current selection (no session state needed)
-                        if format_choice == "🏢 SEC GIS Format":
-                            active_tsv = files['sec_gis_tsv']
-                            active_csv = files['sec_gis_csv'] 
-                            active_excel = files['sec_gis_excel']
-                            active_df = files['sec_gis_dataframe']
-                            format_desc = "SEC GIS"
-                            st.success("✅ **SEC GIS Format Active** - Philippine SEC compliance ready!")
-                        else:
-                            active_tsv = files['tsv']
-                            active_csv = files['csv']
-                            active_excel = files['excel']
-                            active_df = files['dataframe']
-                            format_desc = "Standard"
-                            st.info("ℹ️ **Standard Format Active** - Technical JSON field names")
-                    else:
-                        # No SEC GIS data available, use standard format only
-                        active_tsv = files['tsv']
-                        active_csv = files['csv']
-                        active_excel = files['excel']
-                        active_df = files['dataframe']
-                        format_desc = "Standard"
-                        st.info("ℹ️ **Standard Format** - No SEC GIS data detected")
-                    
-                    # Show current format metrics
-                    col1, col2, col3 = st.columns(3)
-                    with col1:
-                        st.metric("Total Fields", len(active_df))
-                    with col2:
-                        st.metric("Current Format", format_desc)
-                    with col3:
-                        if format_desc == "SEC GIS":
-                            st.metric("Compliance", "Philippine SEC ✓")
-                        else:
-                            st.metric("Type", "Technical")
-                    
-                    # Preview
-                    st.write(f"**📋 Preview ({format_desc} Format):**")
-                    st.dataframe(active_df.head(10), use_container_width=True)
-                    
-                    if len(active_df) > 10:
-                        st.caption(f"Showing first 10 rows. Total: {len(active_df)} rows")
-                    
-                    # Show field name examples
-                    if sec_gis_data:
-                        with st.expander("🔍 Compare field name formats"):
-                            ex_col1, ex_col2 = st.columns(2)
-                            with ex_col1:
-                                st.write("**📊 Standard Format:**")
-                                st.code("corporate_name")
-                                st.code("directors_officers_0_name") 
-                                st.code("sec_registration_number")
-                            with ex_col2:
-                                st.write("**🏢 SEC GIS Format:**")
-                                st.code("Corporate Name")
-                                st.code("Director/Officer 1 Name")
-                                st.code("SEC Registration Number")
-                    
-                    # Download and Copy Options
-                    st.subheader(f"⬇️ Download & Copy Options - {format_desc} Format")
-                    
-                    # One-click copy buttons
-                    st.write("**📋 One-Click Copy to Clipboard:**")
-                    
-                    col1, col2 = st.columns(2)
-                    
-                    with col1:
-                        # TSV Copy Button
-                        st.write("**📝 TSV Format (Perfect for Excel):**")
-                        tsv_component = create_clipboard_component(
-                            active_tsv, 
-                            "📝 Copy", 
-                            f"{format_desc} Copied to clipboard!"
-                        )
-                        components.html(tsv_component, height=70)
-                        
-                        st.write("")
-                        
-
-                    
-                    st.write("---")  # Divider
-                    
-                    # Download buttons section
-                    st.write(f"**💾 Download Files ({format_desc} Format):**")
-                    col1, col2, col3, col4 = st.columns(4)
-                    
-                    suffix = "_sec_gis" if format_desc == "SEC GIS" else ""
-                    
-                    with col1:
-                        st.download_button(
-                            label="📝 Download TSV",
-                            data=active_tsv,
-                            file_name=f"{base_filename}{suffix}_flattened.tsv",
-                            mime="text/tab-separated-values"
-                        )
-                    
-                    with col2:
-                        st.download_button(
-                            label="📄 Download CSV", 
-                            data=active_csv,
-                            file_name=f"{base_filename}{suffix}_flattened.csv",
-                            mime="text/csv"
-                        )
-                    
-                    with col3:
-                        try:
-                            if active_excel:
-                                st.download_button(
-                                    label="📊 Download Excel",
-                                    data=active_excel,
-                                    file_name=f"{base_filename}{suffix}_flattened.xlsx",
-                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                                )
-                            else:
-                                st.download_button(
-                                    label="📊 Download CSV (Excel)",
-                                    data=active_csv,
-                                    file_name=f"{base_filename}{suffix}_flattened.csv",
-                                    mime="text/csv",
-                                    help="Excel format not available - downloading as CSV"
-                                )
-                        except:
-                            st.download_button(
-                                label="📊 Download CSV (Excel)",
-                                data=active_csv,
-                                file_name=f"{base_filename}{suffix}_flattened.csv",
-                                mime="text/csv",
-                                help="Excel format not available - downloading as CSV"
-                            )
-                    
-                    with col4:
-                        if format_desc == "Standard" or format_desc == "Standard (Fallback)":
-                            st.download_button(
-                                label="🔧 Download JSON",
-                                data=files['json'],
-                                file_name=f"{base_filename}_flattened.json", 
-                                mime="application/json"
-                            )
-                        else:
-                            st.download_button(
-                                label="🏢 Both Formats",
-                                data=files['excel'] if files.get('excel') else files['csv'].encode('utf-8'),
-                                file_name=f"{base_filename}_both_formats.xlsx",
-                                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                                help="Downloads both standard and SEC GIS formats in one Excel file"
-                            )
+                    # Format switching reruns only this fragment rather than the whole page
+                    render_results(files, base_filename, sec_gis_data, excel_available, "upload")
                         
             except json.JSONDecodeError as e:
                 st.error(f"❌ Invalid JSON file: {e}")
@@ -751,29 +1100,9 @@ def main():
             
             if st.button("🚀 Process All Files", type="primary"):
                 progress_bar = st.progress(0)
-                results = []
                 
-                for i, file in enumerate(uploaded_files):
-                    try:
-                        content = file.read().decode('utf-8')
-                        json_data = json.loads(content)
-                        flattened = flatten_json_data(json_data)
-                        
-                        results.append({
-                            'filename': file.name,
-                            'flattened_data': flattened,
-                            'status': 'success',
-                            'fields_count': len(flattened)
-                        })
-                        
-                    except Exception as e:
-                        results.append({
-                            'filename': file.name,
-                            'status': 'error',
-                            'error': str(e)
-                        })
-                    
-                    progress_bar.progress((i + 1) / len(uploaded_files))
+                payloads = [(file.name, file.getvalue()) for file in uploaded_files]
+                results = process_batch(payloads, progress_bar)
                 
                 # Show results summary
                 st.subheader("📊 Processing Results")
@@ -789,27 +1118,27 @@ def main():
                 if success_count > 0:
                     st.subheader("⬇️ Download All Results")
                     
-                    # Create ZIP file with all results
+                    # Create ZIP file with all results. The text exports compress well
+                    # even at the fastest level
                     zip_buffer = io.BytesIO()
                     
-                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+                    with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED, compresslevel=1) as zip_file:
                         for result in results:
                             if result['status'] == 'success':
                                 base_name = result['filename'].replace('.json', '')
-                                files = create_download_files(result['flattened_data'], base_name)
+                                files = result['files']
                                 
                                 # Add files to ZIP
                                 zip_file.writestr(f"{base_name}_flattened.csv", files['csv'])
                                 zip_file.writestr(f"{base_name}_flattened.tsv", files['tsv'])
                                 zip_file.writestr(f"{base_name}_flattened.json", files['json'])
                     
-                    zip_buffer.seek(0)
-                    
                     st.download_button(
                         label="📦 Download All (ZIP)",
                         data=zip_buffer.getvalue(),
                         file_name=f"flattened_json_batch_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip",
-                        mime="application/zip"
+                        mime="application/zip",
+                        on_click="ignore"
                     )
                 
                 # Show detailed results
@@ -822,135 +1151,45 @@ def main():
     with tab3:
         st.header("Paste JSON Text")
         
-        json_text = st.text_area(
-            "Paste your JSON here:",
-            height=300,
-            placeholder='{"example": "data", "array": [1, 2, 3], "nested": {"key": "value"}}'
-        )
+        # The text area sits in a form so editing doesn't rerun the app; its value only
+        # changes (and the JSON is only re-parsed) when the form is submitted
+        with st.form("paste_form", clear_on_submit=False, border=False):
+            json_text = st.text_area(
+                "Paste your JSON here:",
+                height=300,
+                placeholder='{"example": "data", "array": [1, 2, 3], "nested": {"key": "value"}}'
+            )
+            st.form_submit_button("🔍 Analyze JSON")
         
         if json_text.strip():
             try:
-                # Validate JSON
-                json_data = json.loads(json_text)
+                # Validate JSON - one walk yields both the analysis and the flattened data.
+                # Encoded once so parsing and the caches take bytes, as for uploads
+                raw = json_text.encode('utf-8')
+                analysis, flattened, top_level = process_json(raw)
                 st.success("✅ Valid JSON detected")
                 
                 col1, col2 = st.columns([1, 1])
                 
                 with col1:
-                    analysis = analyze_json_structure(json_data)
                     st.metric("Arrays", len(analysis['arrays']))
                     st.metric("Nested Objects", len(analysis['nested_objects']))
                     st.metric("Fields", analysis['primitive_fields'])
                 
                 with col2:
                     if st.button("🚀 Flatten Pasted JSON", type="primary"):
-                        flattened = flatten_json_data(json_data)
-                        
                         # Check if this looks like SEC GIS data
-                        sec_gis_data = None
-                        if any(key in json_data for key in ['corporate_name', 'sec_registration_number', 'director_officer_name_1', 'business_trade_name', 'document_type']):
-                            sec_gis_data = map_sec_gis_fields(json_data)
+                        is_sec_gis = not _SEC_GIS_KEYS.isdisjoint(top_level)
+                        sec_gis_data, files = build_download_files(raw, "pasted_json", is_sec_gis, flattened, top_level)
+                        if sec_gis_data:
                             st.info("🏢 SEC GIS format detected! Philippine SEC format available.")
                         
-                        files = create_download_files(flattened, "pasted_json", sec_gis_data)
-                        
                         st.success(f"✅ Flattened into **{len(flattened)} fields**")
                         if sec_gis_data:
                             st.success(f"📋 SEC GIS format: **{len(sec_gis_data)} Philippine SEC fields**")
                         
-                        # Format selector for pasted JSON
-                        if sec_gis_data:
-                            format_choice = st.radio(
-                                "Choose format:",
-                                ["📊 Standard Flattened", "🏢 SEC GIS Format"],
-                                horizontal=True,
-                                index=1,  # Default to SEC GIS Format
-                                key="paste_format"
-                            )
-                            
-                            # Determine which data to use
-                            if format_choice == "🏢 SEC GIS Format":
-                                active_tsv = files['sec_gis_tsv']
-                                active_csv = files['sec_gis_csv']
-                                active_df = files['sec_gis_dataframe']
-                                format_name = "SEC GIS"
-                            else:
-                                active_tsv = files['tsv']
-                                active_csv = files['csv']
-                                active_df = files['dataframe']
-                                format_name = "Standard"
-                        else:
-                            active_tsv = files['tsv']
-                            active_csv = files['csv']
-                            active_df = files['dataframe']
-                            format_name = "Standard"
-                        
-                        # Show preview and copy options
-                        st.dataframe(active_df.head(10), use_container_width=True)
-                        
-                        # One-click copy for pasted JSON
-                        st.write(f"**📋 One-Click Copy ({format_name}):**")
-                        
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            tsv_component = create_clipboard_component(
-                                active_tsv,
-                                "📝 Copy",
-                                f"{format_name} Copied!"
-                            )
-                            components.html(tsv_component, height=70)
-                            
-                            
-                        
-                        # Download options
-                        st.write(f"**💾 Download Options ({format_name}):**")
-                        col1, col2, col3 = st.columns(3)
-                        
-                        with col1:
-                            st.download_button(
-                                label="📝 TSV",
-                                data=active_tsv,
-                                file_name=f"pasted_json_{format_name.lower()}_flattened.tsv"
-                            )
-                        
-                        with col2:
-                            st.download_button(
-                                label="📄 CSV",
-                                data=active_csv, 
-                                file_name=f"pasted_json_{format_name.lower()}_flattened.csv"
-                            )
-                        
-                        with col3:
-                            if sec_gis_data and files.get('sec_gis_excel'):
-                                try:
-                                    excel_data = files['sec_gis_excel'] if format_name == "SEC GIS" else files['excel']
-                                    if excel_data and len(excel_data) > len(active_csv):
-                                        st.download_button(
-                                            label="📊 Excel",
-                                            data=excel_data,
-                                            file_name=f"pasted_json_{format_name.lower()}_flattened.xlsx"
-                                        )
-                                    else:
-                                        st.download_button(
-                                            label="📊 CSV (Excel)",
-                                            data=active_csv,
-                                            file_name=f"pasted_json_{format_name.lower()}_flattened.csv",
-                                            help="Excel format not available"
-                                        )
-                                except:
-                                    st.download_button(
-                                        label="📊 CSV (Excel)",
-                                        data=active_csv,
-                                        file_name=f"pasted_json_{format_name.lower()}_flattened.csv",
-                                        help="Excel format not available"
-                                    )
-                            else:
-                                st.download_button(
-                                    label="📊 CSV (Excel)",
-                                    data=active_csv,
-                                    file_name=f"pasted_json_{format_name.lower()}_flattened.csv"
-                                )
+                        # Format switching reruns only this fragment, so the results stay up
+                        render_results(files, "pasted_json", sec_gis_data, excel_available, "paste")
                             
             except json.JSONDecodeError as e:
                 st.error(f"❌ Invalid JSON: {e}")
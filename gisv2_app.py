@@ -2,11 +2,40 @@ import streamlit as st
 import json
 import pandas as pd
 import io
+import csv
+import functools
+import os
+import sys
 from typing import Any, Dict, Union, List, Tuple
 import zipfile
 from datetime import datetime
 import streamlit.components.v1 as components
 from difflib import SequenceMatcher
+from types import MappingProxyType
+
+# Prefer orjson for parsing when installed, stdlib json otherwise
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# orjson silently turns integers beyond 64 bits into floats, so text with a run of 19+
+# digits is parsed by the stdlib instead. Digits are masked to b'0' and everything else
+# to b' ' so the check is one C-level translate plus a substring search
+_DIGIT_MASK = bytes(0x30 if 0x30 <= b <= 0x39 else 0x20 for b in range(256))
+_LONG_DIGIT_RUN = b'0' * 19
+
+# Prefer rapidfuzz for similarity scoring when installed, difflib otherwise
+try:
+    from rapidfuzz import fuzz, process as rapidfuzz_process
+except ImportError:
+    fuzz = rapidfuzz_process = None
+
+# Excel downloads stream through xlsxwriter when installed, openpyxl otherwise
+try:
+    import xlsxwriter
+except ImportError:
+    xlsxwriter = None
 
 # Set page config
 st.set_page_config(
@@ -16,117 +45,73 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-def create_clipboard_component(text_data, button_text, success_message):
-    """Create a working clipboard copy component"""
-    
-    # Create unique key for this component
-    component_key = f"clipboard_{abs(hash(text_data[:100]))}"
-    
-    # Escape the text data for JavaScript
-    escaped_text = text_data.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r')
-    
-    # HTML and JavaScript for clipboard functionality
-    html_code = f"""
-    <div style="margin: 10px 0;">
-        <button id="copyBtn_{component_key}" 
-                onclick="copyToClipboard_{component_key}()" 
-                style="
-                    background-color: #ff4b4b;
-                    color: white;
-                    border: none;
-                    padding: 8px 16px;
-                    border-radius: 4px;
-                    cursor: pointer;
-                    font-size: 14px;
-                ">
-            {button_text}
-        </button>
-        <span id="status_{component_key}" style="margin-left: 10px; color: green; font-weight: bold;"></span>
-    </div>
-    
-    <script>
-        function copyToClipboard_{component_key}() {{
-            const text = "{escaped_text}";
-            
-            if (navigator.clipboard) {{
-                navigator.clipboard.writeText(text).then(function() {{
-                    document.getElementById('status_{component_key}').innerHTML = '✅ {success_message}';
-                    document.getElementById('copyBtn_{component_key}').innerHTML = '✅ Copied!';
-                    setTimeout(() => {{
-                        document.getElementById('status_{component_key}').innerHTML = '';
-                        document.getElementById('copyBtn_{component_key}').innerHTML = '{button_text}';
-                    }}, 3000);
-                }}, function(err) {{
-                    console.error('Clipboard failed: ', err);
-                    fallbackCopy_{component_key}(text);
-                }});
-            }} else {{
-                fallbackCopy_{component_key}(text);
-            }}
-        }}
-        
-        function fallbackCopy_{component_key}(text) {{
-            const textArea = document.createElement('textarea');
-            textArea.value = text;
-            document.body.appendChild(textArea);
-            textArea.select();
-            
-            try {{
-                document.execCommand('copy');
-                document.getElementById('status_{component_key}').innerHTML = '✅ {success_message}';
-                document.getElementById('copyBtn_{component_key}').innerHTML = '✅ Copied!';
-                setTimeout(() => {{
-                    document.getElementById('status_{component_key}').innerHTML = '';
-                    document.getElementById('copyBtn_{component_key}').innerHTML = '{button_text}';
-                }}, 3000);
-            }} catch (err) {{
-                document.getElementById('status_{component_key}').innerHTML = '❌ Copy failed - select text below';
-                const preElement = document.createElement('pre');
-                preElement.style.cssText = 'border:1px solid #ccc;padding:10px;max-height:200px;overflow:auto;background:#f9f9f9;margin:10px 0;user-select:all;';
-                preElement.textContent = text;
-                document.getElementById('copyBtn_{component_key}').parentNode.appendChild(preElement);
-            }}
-            
-            document.body.removeChild(textArea);
-        }}
-    </script>
-    """
-    
-    return html_code
+def load_json(content: Union[str, bytes]) -> Any:
+    """Parse JSON text, using orjson when available and it parses the text exactly like the stdlib."""
+    if orjson is not None:
+        raw = content.encode('utf-8') if isinstance(content, str) else content
+        if _LONG_DIGIT_RUN not in raw.translate(_DIGIT_MASK):
+            try:
+                return orjson.loads(raw)
+            except orjson.JSONDecodeError:
+                # NaN/Infinity, which the stdlib accepts, or invalid JSON, which it reports
+                pass
+    return json.loads(content)
+
+# Copy buttons share one static frontend; the payload travels as a component prop
+clipboard_button = components.declare_component(
+    "clipboard_button",
+    path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "clipboard_component")
+)
 
-def flatten_json_data(json_data: Union[str, Dict]) -> Dict[str, Any]:
+def create_clipboard_component(text_data, button_text, success_message, key=None):
+    """Render a one-click copy button through the shared clipboard component"""
+    clipboard_button(
+        text=text_data,
+        button_text=button_text,
+        success_message=success_message,
+        key=key,
+        default=None
+    )
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def flatten_json_data(json_data: Union[str, bytes, Dict], _parsed: Any = None) -> Dict[str, Any]:
     """
     Flattens a JSON object (including arrays and nested objects) into a flat dictionary.
+    Raw text callers that already parsed it pass the result as _parsed, which is not hashed.
     """
     
-    def flatten_dict(obj: Any, parent_key: str = '', sep: str = '_') -> Dict[str, Any]:
-        """Recursively flatten nested dictionaries and arrays."""
-        items = []
+    def flatten_dict(obj: Any) -> Dict[str, Any]:
+        """Flatten nested dictionaries and arrays with an explicit work stack."""
+        flattened = {}
+        stack = [(obj, '')]
         
-        if isinstance(obj, dict):
-            for key, value in obj.items():
-                new_key = f"{parent_key}{sep}{key}" if parent_key else key
-                items.extend(flatten_dict(value, new_key, sep).items())
-                
-        elif isinstance(obj, list):
-            if len(obj) == 0:
-                items.append((parent_key, "[]"))
-            else:
-                for i, item in enumerate(obj):
-                    new_key = f"{parent_key}{sep}{i}"
-                    if isinstance(item, (dict, list)):
-                        items.extend(flatten_dict(item, new_key, sep).items())
-                    else:
-                        items.append((new_key, item))
-        else:
-            items.append((parent_key, obj))
+        while stack:
+            current, parent_key = stack.pop()
+            
+            if isinstance(current, dict):
+                # Push children in reverse so they pop in document order
+                key_prefix = parent_key + '_' if parent_key else ''
+                for key in reversed(current):
+                    stack.append((current[key], key_prefix + key))
             
-        return dict(items)
+            elif isinstance(current, list):
+                if len(current) == 0:
+                    flattened[parent_key] = "[]"
+                else:
+                    key_prefix = parent_key + '_'
+                    for i in range(len(current) - 1, -1, -1):
+                        stack.append((current[i], key_prefix + str(i)))
+            else:
+                flattened[parent_key] = current
+        
+        return flattened
     
-    # Parse JSON if it's a string
-    if isinstance(json_data, str):
+    # Parse JSON if it's a string or raw bytes
+    if _parsed is not None:
+        data = _parsed
+    elif isinstance(json_data, (str, bytes)):
         try:
-            data = json.loads(json_data)
+            data = load_json(json_data)
         except json.JSONDecodeError as e:
             raise ValueError(f"Invalid JSON string: {e}")
     else:
@@ -134,14 +119,18 @@ def flatten_json_data(json_data: Union[str, Dict]) -> Dict[str, Any]:
     
     return flatten_dict(data)
 
+@functools.lru_cache(maxsize=4096)
 def format_field_name(field_name: str) -> str:
     """Convert snake_case field names to Title Case for better readability."""
     return field_name.replace('_', ' ').title()
 
-def analyze_json_structure(json_data: Union[str, Dict]) -> Dict[str, Any]:
+@st.cache_data(max_entries=64, show_spinner=False)
+def analyze_json_structure(json_data: Union[str, bytes, Dict], _parsed: Any = None) -> Dict[str, Any]:
     """Analyze the structure of JSON to understand arrays and nested objects."""
-    if isinstance(json_data, str):
-        data = json.loads(json_data)
+    if _parsed is not None:
+        data = _parsed
+    elif isinstance(json_data, (str, bytes)):
+        data = load_json(json_data)
     else:
         data = json_data
     
@@ -181,168 +170,197 @@ def analyze_json_structure(json_data: Union[str, Dict]) -> Dict[str, Any]:
     
     return analyze_recursive(data)
 
-def map_sec_gis_fields(json_data: Union[str, Dict]) -> Dict[str, Any]:
+# SEC GIS general information fields (label, JSON key) - following exact arrangement
+_SEC_GIS_HEADER_FIELDS = (
+    ("Document Type", "document_type"),
+    ("For the year", "for_the_year"),
+    ("Corporate Name", "business_trade_name"),
+    ("Business/Trade Name", "business_trade_name"),
+    ("Date Registered", "date_registered"),
+    ("Fiscal Year End", "fiscal_year_end"),
+    ("SEC Registration Number", "sec_registration_number"),
+    ("Corporate TIN", "corporate_tin"),
+    ("Website/URL", "website_url"),
+    ("Principal Office Address", "principal_office_address"),
+    ("Business Address", "business_address"),
+    ("Official e-mail address", "official_email"),
+    ("Alternate Email Address", "alternate_email"),
+    ("Official Mobile Number", "official_mobile"),
+    ("Alternate Mobile Number", "alternate_mobile"),
+    ("Primary Purpose/Industry", "primary_purpose_industry"),
+    ("Industry Classification", "industry_classification"),
+    ("Geographical Code", "geographical_code"),
+    ("Parent Company Name", "parent_company_name"),
+    ("Parent Company SEC Reg. No.", "parent_company_sec_reg_no"),
+    ("Parent Company Address", "parent_company_address"),
+    ("Subsidiary/Affiliate", "subsidiary_affiliate"),
+    ("Subsidiary/Affiliate SEC Reg. No.", "subsidiary_affiliate_sec_reg_no"),
+    ("Subsidiary/Affiliate Address", "subsidiary_affiliate_address"),
+    ("External Auditor", "external_auditor"),
+    ("Auditor SEC Accreditation Number", "auditor_sec_accreditation_number"),
+    ("Covered Person (AML)", "covered_person_aml"),
+    ("AMLA Category 1", "amla_category_1"),
+    ("AMLA Category 2", "amla_category_2"),
+    ("AMLA Category 3", "amla_category_3"),
+    ("AMLA Category 4", "amla_category_4"),
+    ("AMLA Category 5", "amla_category_5"),
+    ("AMLA Category 6", "amla_category_6"),
+    ("AMLA Category 7", "amla_category_7"),
+    ("AMLA Category 8", "amla_category_8"),
+    ("AMLA Compliance Status", "amla_compliance_status"),
+    ("Corporate Name (2)", "business_trade_name"),
+    ("Corporate Name (3)", "business_trade_name"),
+    ("Auth Capital Stock - Type of Shares 1", "auth_capital_stock_type_of_shares_1"),
+    ("Auth Capital Stock - Number of Shares 1", "auth_capital_stock_number_of_shares_1"),
+    ("Auth Capital Stock - Par / Stated Value 1", "auth_capital_stock_par_stated_value_1"),
+    ("Auth Capital Stock - Amount (PhP) 1", "auth_capital_stock_amount_php_1"),
+    ("Filipino Subscribed Capital - Type of Shares 1", "filipino_subscribed_capital_type_of_shares_1"),
+    ("Filipino Subscribed Capital - Number of Shares 1", "filipino_subscribed_capital_number_of_shares_1"),
+    ("Filipino Subscribed Capital - Par / Stated Value 1", "filipino_subscribed_capital_par_stated_value_1"),
+    ("Filipino Subscribed Capital - Amount (PhP) 1", "filipino_subscribed_capital_amount_php_1"),
+    ("Foreign Subscribed Capital - Type of Shares 1", "foreign_subscribed_capital_type_of_shares_1"),
+    ("Foreign Subscribed Capital - Number of Shares 1", "foreign_subscribed_capital_number_of_shares_1"),
+    ("Foreign Subscribed Capital - Par / Stated Value 1", "foreign_subscribed_capital_par_stated_value_1"),
+    ("Foreign Subscribed Capital - Amount (PhP) 1", "foreign_subscribed_capital_amount_php_1"),
+    ("Subscribed Capital_% Foreigh Equity", "subscribed_capital_foreign_equity_percentage"),
+    ("Subscribed Capital_Total", "subscribed_capital_total"),
+    ("Filipino Paid-Up Capital - Type of Shares 1", "filipino_paid_up_capital_type_of_shares_1"),
+    ("Filipino Paid-up Capital Number of Shares 1", "filipino_paid_up_capital_number_of_shares_1"),
+    ("Filipino Paid-Up Capital - Par / Stated Value 1", "filipino_paid_up_capital_par_stated_value_1"),
+    ("Filipino Paid-Up Capital - Amount (PhP) 1", "filipino_paid_up_capital_amount_php_1"),
+    ("Foreign Paid-Up Capital - Type of Shares 1", "foreign_paid_up_capital_type_of_shares_1"),
+    ("Foreign Paid-up Capital Number of Shares 1", "foreign_paid_up_capital_number_of_shares_1"),
+    ("Foreign Paid-Up Capital - Par / Stated Value 1", "foreign_paid_up_capital_par_stated_value_1"),
+    ("Foreign Paid-Up Capital - Amount (PhP) 1", "foreign_paid_up_capital_amount_php_1"),
+    ("Paid-up Capital_% Foreigh Equity", "paid_up_capital_foreign_equity_percentage"),
+    ("Paid-Up Capital_Total", "paid_up_capital_total"),
+    ("Corporate Name (4)", "business_trade_name"),
+    ("Corporate Name (5)", "business_trade_name"),
+    ("Corporate Name (6)", "business_trade_name"),
+)
+
+# Per-entry (label suffix, JSON key part) for the numbered Director/Officer and Stockholder sections
+_DIRECTOR_OFFICER_FIELDS = (
+    ("Name", "name"),
+    ("Address", "address"),
+    ("Nationality", "nationality"),
+    ("INC'R", "inc_r"),
+    ("Board", "board"),
+    ("Gender", "gender"),
+    ("Stock Holder", "stock_holder"),
+    ("Officer", "officer"),
+    ("Exec Comm.", "exec_comm"),
+    ("TIN", "tin"),
+)
+
+_STOCKHOLDER_FIELDS = (
+    ("Name", "name"),
+    ("Nationality", "nationality"),
+    ("Address", "address"),
+    ("Total Shares Subscribed_No.", "shares_subscribed_number"),
+    ("Total Shares Subscribed_Amount (PHP)", "shares_subscribed_amount"),
+    ("% of Ownership", "ownership_percentage"),
+    ("Amount Paid (PHP)", "amount_paid"),
+    ("TIN", "tin"),
+)
+
+# Stockholder summary fields between the Director/Officer and Stockholder sections
+_SEC_GIS_STOCKHOLDER_SUMMARY_FIELDS = (
+    ("Total Number of Stockholders", "total_number_stockholders"),
+    ("Number of Stockholders with ≥100 shares", "number_stockholders_100_plus_shares"),
+    ("Total Assets (Latest Audited FS)", "total_assets"),
+)
+
+# Remaining financial and other information. The "(from Stockholder detail pages)"
+# totals read the Filipino capital amounts
+_SEC_GIS_FINANCIAL_FIELDS = (
+    ("Subscribed Capital_Total (PHP) (from Stockholder detail pages)", "filipino_subscribed_capital_amount_php_1"),
+    ("Paid-Up Capital_Total (PHP) (from Stockholder detail pages)", "filipino_paid_up_capital_amount_php_1"),
+    ("Unrestricted Retained Earnings (PHP)", "unrestricted_retained_earnings"),
+    ("Prior year Dividends_Cash (PHP)", "prior_year_dividends_cash"),
+    ("Prior year Dividends_Stock (PHP)", "prior_year_dividends_stock"),
+    ("Prior year Dividends_Property (PHP)", "prior_year_dividends_property"),
+    ("Prior year Dividends_Total (PHP)", "prior_year_dividends_total"),
+    ("Share Issuance_Date", "share_issuance_date"),
+    ("Share Issuance_No", "share_issuance_number"),
+    ("Share Issuance_Amount (PHP)", "share_issuance_amount"),
+    ("SEC License Type", "sec_license_type"),
+    ("SEC Licnese Date", "sec_license_date"),
+    ("SEC Ops start", "sec_ops_start"),
+    ("BSP License Type", "bsp_license_type"),
+    ("BSP Licnese Date", "bsp_license_date"),
+    ("BSP Ops start", "bsp_ops_start"),
+    ("IC License Type", "ic_license_type"),
+    ("IC Licnese Date", "ic_license_date"),
+    ("IC Ops start", "ic_ops_start"),
+    ("Total Comp (PHP)", "total_compensation"),
+    ("No Officers", "number_officers"),
+    ("No Employees", "number_employees"),
+    ("Total Manpower", "total_manpower"),
+    ("UBO_Name", "ubo_name"),
+    ("UBO_Address", "ubo_address"),
+    ("UBO_Naitonality", "ubo_nationality"),
+    ("UBO_DOB", "ubo_dob"),
+    ("UBO_TIN", "ubo_tin"),
+    ("UBO_% ownership", "ubo_ownership_percentage"),
+    ("UBO_Type", "ubo_type"),
+    ("UBO_Category", "ubo_category"),
+)
+
+# Full SEC GIS layout built once at import: up to 20 Directors/Officers and
+# 10 Stockholders as per the Pydantic model
+SEC_GIS_FIELDS = (
+    _SEC_GIS_HEADER_FIELDS
+    + tuple(
+        (f"Director/Officer {i} {label}", f"director_officer_{key}_{i}")
+        for i in range(1, 21)
+        for label, key in _DIRECTOR_OFFICER_FIELDS
+    )
+    + _SEC_GIS_STOCKHOLDER_SUMMARY_FIELDS
+    + tuple(
+        (f"Stockholder {i} {label}", f"stockholder_{key}_{i}")
+        for i in range(1, 11)
+        for label, key in _STOCKHOLDER_FIELDS
+    )
+    + _SEC_GIS_FINANCIAL_FIELDS
+)
+
+def clean_sec_gis_value(value: Any) -> str:
+    """Render a SEC GIS value as a string, with None and "null" as empty"""
+    if isinstance(value, str):
+        # Most values are already strings; only four-character ones can spell "null"
+        return "" if len(value) == 4 and value.lower() == "null" else value
+    if value is None:
+        return ""
+    return str(value)
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def map_sec_gis_fields(json_data: Union[str, bytes, Dict], _parsed: Any = None) -> Dict[str, Any]:
     """
     Maps JSON data to SEC GIS field format
     """
-    if isinstance(json_data, str):
-        data = json.loads(json_data)
+    if _parsed is not None:
+        data = _parsed
+    elif isinstance(json_data, (str, bytes)):
+        data = load_json(json_data)
     else:
         data = json_data
     
-    # SEC GIS Field mapping - following exact arrangement
-    field_mapping = {
-        "Document Type": data.get("document_type", ""),
-        "For the year": data.get("for_the_year", ""),
-        "Corporate Name": data.get("business_trade_name", ""),
-        "Business/Trade Name": data.get("business_trade_name", ""),
-        "Date Registered": data.get("date_registered", ""),
-        "Fiscal Year End": data.get("fiscal_year_end", ""),
-        "SEC Registration Number": data.get("sec_registration_number", ""),
-        "Corporate TIN": data.get("corporate_tin", ""),
-        "Website/URL": data.get("website_url", ""),
-        "Principal Office Address": data.get("principal_office_address", ""),
-        "Business Address": data.get("business_address", ""),
-        "Official e-mail address": data.get("official_email", ""),
-        "Alternate Email Address": data.get("alternate_email", ""),
-        "Official Mobile Number": data.get("official_mobile", ""),
-        "Alternate Mobile Number": data.get("alternate_mobile", ""),
-        "Primary Purpose/Industry": data.get("primary_purpose_industry", ""),
-        "Industry Classification": data.get("industry_classification", ""),
-        "Geographical Code": data.get("geographical_code", ""),
-        "Parent Company Name": data.get("parent_company_name", ""),
-        "Parent Company SEC Reg. No.": data.get("parent_company_sec_reg_no", ""),
-        "Parent Company Address": data.get("parent_company_address", ""),
-        "Subsidiary/Affiliate": data.get("subsidiary_affiliate", ""),
-        "Subsidiary/Affiliate SEC Reg. No.": data.get("subsidiary_affiliate_sec_reg_no", ""),
-        "Subsidiary/Affiliate Address": data.get("subsidiary_affiliate_address", ""),
-        "External Auditor": data.get("external_auditor", ""),
-        "Auditor SEC Accreditation Number": data.get("auditor_sec_accreditation_number", ""),
-        "Covered Person (AML)": data.get("covered_person_aml", ""),
-        "AMLA Category 1": data.get("amla_category_1", ""),
-        "AMLA Category 2": data.get("amla_category_2", ""),
-        "AMLA Category 3": data.get("amla_category_3", ""),
-        "AMLA Category 4": data.get("amla_category_4", ""),
-        "AMLA Category 5": data.get("amla_category_5", ""),
-        "AMLA Category 6": data.get("amla_category_6", ""),
-        "AMLA Category 7": data.get("amla_category_7", ""),
-        "AMLA Category 8": data.get("amla_category_8", ""),
-        "AMLA Compliance Status": data.get("amla_compliance_status", ""),
-        "Corporate Name (2)": data.get("business_trade_name", ""),
-        "Corporate Name (3)": data.get("business_trade_name", ""),
-        "Auth Capital Stock - Type of Shares 1": data.get("auth_capital_stock_type_of_shares_1", ""),
-        "Auth Capital Stock - Number of Shares 1": data.get("auth_capital_stock_number_of_shares_1", ""),
-        "Auth Capital Stock - Par / Stated Value 1": data.get("auth_capital_stock_par_stated_value_1", ""),
-        "Auth Capital Stock - Amount (PhP) 1": data.get("auth_capital_stock_amount_php_1", ""),
-        "Filipino Subscribed Capital - Type of Shares 1": data.get("filipino_subscribed_capital_type_of_shares_1", ""),
-        "Filipino Subscribed Capital - Number of Shares 1": data.get("filipino_subscribed_capital_number_of_shares_1", ""),
-        "Filipino Subscribed Capital - Par / Stated Value 1": data.get("filipino_subscribed_capital_par_stated_value_1", ""),
-        "Filipino Subscribed Capital - Amount (PhP) 1": data.get("filipino_subscribed_capital_amount_php_1", ""),
-        "Foreign Subscribed Capital - Type of Shares 1": data.get("foreign_subscribed_capital_type_of_shares_1", ""),
-        "Foreign Subscribed Capital - Number of Shares 1": data.get("foreign_subscribed_capital_number_of_shares_1", ""),
-        "Foreign Subscribed Capital - Par / Stated Value 1": data.get("foreign_subscribed_capital_par_stated_value_1", ""),
-        "Foreign Subscribed Capital - Amount (PhP) 1": data.get("foreign_subscribed_capital_amount_php_1", ""),
-        "Subscribed Capital_% Foreigh Equity": data.get("subscribed_capital_foreign_equity_percentage", ""),
-        "Subscribed Capital_Total": data.get("subscribed_capital_total", ""),
-        "Filipino Paid-Up Capital - Type of Shares 1": data.get("filipino_paid_up_capital_type_of_shares_1", ""),
-        "Filipino Paid-up Capital Number of Shares 1": data.get("filipino_paid_up_capital_number_of_shares_1", ""),
-        "Filipino Paid-Up Capital - Par / Stated Value 1": data.get("filipino_paid_up_capital_par_stated_value_1", ""),
-        "Filipino Paid-Up Capital - Amount (PhP) 1": data.get("filipino_paid_up_capital_amount_php_1", ""),
-        "Foreign Paid-Up Capital - Type of Shares 1": data.get("foreign_paid_up_capital_type_of_shares_1", ""),
-        "Foreign Paid-up Capital Number of Shares 1": data.get("foreign_paid_up_capital_number_of_shares_1", ""),
-        "Foreign Paid-Up Capital - Par / Stated Value 1": data.get("foreign_paid_up_capital_par_stated_value_1", ""),
-        "Foreign Paid-Up Capital - Amount (PhP) 1": data.get("foreign_paid_up_capital_amount_php_1", ""),
-        "Paid-up Capital_% Foreigh Equity": data.get("paid_up_capital_foreign_equity_percentage", ""),
-        "Paid-Up Capital_Total": data.get("paid_up_capital_total", ""),
-        "Corporate Name (4)": data.get("business_trade_name", ""),
-        "Corporate Name (5)": data.get("business_trade_name", ""),
-        "Corporate Name (6)": data.get("business_trade_name", ""),
-    }
-    
-    # Add Directors/Officers - up to 20 entries as per Pydantic model
-    for i in range(1, 21):  # 1-20 Director/Officer entries
-        field_mapping[f"Director/Officer {i} Name"] = data.get(f"director_officer_name_{i}", "")
-        field_mapping[f"Director/Officer {i} Address"] = data.get(f"director_officer_address_{i}", "")
-        field_mapping[f"Director/Officer {i} Nationality"] = data.get(f"director_officer_nationality_{i}", "")
-        field_mapping[f"Director/Officer {i} INC'R"] = data.get(f"director_officer_inc_r_{i}", "")
-        field_mapping[f"Director/Officer {i} Board"] = data.get(f"director_officer_board_{i}", "")
-        field_mapping[f"Director/Officer {i} Gender"] = data.get(f"director_officer_gender_{i}", "")
-        field_mapping[f"Director/Officer {i} Stock Holder"] = data.get(f"director_officer_stock_holder_{i}", "")
-        field_mapping[f"Director/Officer {i} Officer"] = data.get(f"director_officer_officer_{i}", "")
-        field_mapping[f"Director/Officer {i} Exec Comm."] = data.get(f"director_officer_exec_comm_{i}", "")
-        field_mapping[f"Director/Officer {i} TIN"] = data.get(f"director_officer_tin_{i}", "")
-    
-    # Continue with remaining fields
-    field_mapping.update({
-        "Total Number of Stockholders": data.get("total_number_stockholders", ""),
-        "Number of Stockholders with ≥100 shares": data.get("number_stockholders_100_plus_shares", ""),
-        "Total Assets (Latest Audited FS)": data.get("total_assets", ""),
-    })
-    
-    # Add Stockholders - up to 10 entries as per Pydantic model
-    for i in range(1, 11):  # 1-10 Stockholder entries
-        field_mapping[f"Stockholder {i} Name"] = data.get(f"stockholder_name_{i}", "")
-        field_mapping[f"Stockholder {i} Nationality"] = data.get(f"stockholder_nationality_{i}", "")
-        field_mapping[f"Stockholder {i} Address"] = data.get(f"stockholder_address_{i}", "")
-        field_mapping[f"Stockholder {i} Total Shares Subscribed_No."] = data.get(f"stockholder_shares_subscribed_number_{i}", "")
-        field_mapping[f"Stockholder {i} Total Shares Subscribed_Amount (PHP)"] = data.get(f"stockholder_shares_subscribed_amount_{i}", "")
-        field_mapping[f"Stockholder {i} % of Ownership"] = data.get(f"stockholder_ownership_percentage_{i}", "")
-        field_mapping[f"Stockholder {i} Amount Paid (PHP)"] = data.get(f"stockholder_amount_paid_{i}", "")
-        field_mapping[f"Stockholder {i} TIN"] = data.get(f"stockholder_tin_{i}", "")
-    
-    # Add remaining financial and other information
-    field_mapping.update({
-        "Subscribed Capital_Total (PHP) (from Stockholder detail pages)": data.get("subscribed_capital_total_from_stockholders", ""),
-        "Paid-Up Capital_Total (PHP) (from Stockholder detail pages)": data.get("paid_up_capital_total_from_stockholders", ""),
-        "Subscribed Capital_Total (PHP) (from Stockholder detail pages)": data.get("filipino_subscribed_capital_amount_php_1", ""),
-        "Paid-Up Capital_Total (PHP) (from Stockholder detail pages)": data.get("filipino_paid_up_capital_amount_php_1", ""),
-        "Unrestricted Retained Earnings (PHP)": data.get("unrestricted_retained_earnings", ""),
-        "Prior year Dividends_Cash (PHP)": data.get("prior_year_dividends_cash", ""),
-        "Prior year Dividends_Stock (PHP)": data.get("prior_year_dividends_stock", ""),
-        "Prior year Dividends_Property (PHP)": data.get("prior_year_dividends_property", ""),
-        "Prior year Dividends_Total (PHP)": data.get("prior_year_dividends_total", ""),
-        "Share Issuance_Date": data.get("share_issuance_date", ""),
-        "Share Issuance_No": data.get("share_issuance_number", ""),
-        "Share Issuance_Amount (PHP)": data.get("share_issuance_amount", ""),
-        "SEC License Type": data.get("sec_license_type", ""),
-        "SEC Licnese Date": data.get("sec_license_date", ""),
-        "SEC Ops start": data.get("sec_ops_start", ""),
-        "BSP License Type": data.get("bsp_license_type", ""),
-        "BSP Licnese Date": data.get("bsp_license_date", ""),
-        "BSP Ops start": data.get("bsp_ops_start", ""),
-        "IC License Type": data.get("ic_license_type", ""),
-        "IC Licnese Date": data.get("ic_license_date", ""),
-        "IC Ops start": data.get("ic_ops_start", ""),
-        "Total Comp (PHP)": data.get("total_compensation", ""),
-        "No Officers": data.get("number_officers", ""),
-        "No Employees": data.get("number_employees", ""),
-        "Total Manpower": data.get("total_manpower", ""),
-        "UBO_Name": data.get("ubo_name", ""),
-        "UBO_Address": data.get("ubo_address", ""),
-        "UBO_Naitonality": data.get("ubo_nationality", ""),
-        "UBO_DOB": data.get("ubo_dob", ""),
-        "UBO_TIN": data.get("ubo_tin", ""),
-        "UBO_% ownership": data.get("ubo_ownership_percentage", ""),
-        "UBO_Type": data.get("ubo_type", ""),
-        "UBO_Category": data.get("ubo_category", ""),
-    })
-    
-    # Clean null values
-    cleaned_mapping = {}
-    for field, value in field_mapping.items():
-        if value is None or str(value).lower() == "null":
-            cleaned_mapping[field] = ""
-        else:
-            cleaned_mapping[field] = str(value)
-    
-    return cleaned_mapping
+    # Look up every SEC GIS field from the table built at import, cleaning nulls as we go
+    return {field: clean_sec_gis_value(data.get(key, "")) for field, key in SEC_GIS_FIELDS}
 
 def normalize_value(value: Any) -> str:
     """Normalize values for comparison by handling nulls, case, and whitespace."""
     if value is None:
         return ""
     
-    str_value = str(value).strip()
+    # Ground truth cells and JSON values repeat a lot, so strings go through the cache
+    return normalize_text(value if isinstance(value, str) else str(value))
+
+@functools.lru_cache(maxsize=4096)
+def normalize_text(str_value: str) -> str:
+    """Strip surrounding whitespace from a value's string form."""
+    str_value = str_value.strip()
     
     # Handle various null representations
     # if str_value.lower() in ['null', 'n/a', 'na', 'none', '']:
@@ -354,7 +372,270 @@ def similarity_score(val1: str, val2: str) -> float:
     """Calculate similarity score between two strings (0.0 to 1.0)."""
     if val1 == val2:
         return 1.0
-    return SequenceMatcher(None, val1.lower(), val2.lower()).ratio()
+    return similarity_ratio(val1.lower(), val2.lower())
+
+@functools.lru_cache(maxsize=4096)
+def similarity_ratio(val1_lower: str, val2_lower: str) -> float:
+    """Similarity ratio of two lowercased strings, cached for repeated pairs."""
+    if fuzz is not None:
+        return fuzz.ratio(val1_lower, val2_lower) / 100.0
+    return SequenceMatcher(None, val1_lower, val2_lower).ratio()
+
+# Specific ground truth field name -> JSON key mappings for common cases.
+# An empty key marks a field that is truly missing from the JSON
+GROUND_TRUTH_FIELD_MAPPINGS = MappingProxyType({
+    # Basic company info
+    'Document Type': 'document_type',
+    'For the year': 'for_the_year',
+    'Corporate Name': 'business_trade_name',
+    'Business/Trade Name': 'business_trade_name',
+    'Date Registered': 'date_registered',
+    'Fiscal Year End': 'fiscal_year_end',
+    'SEC Registration Number': 'sec_registration_number',
+    'Corporate TIN': 'corporate_tin',
+    'Website/URL': 'website_url',
+    'Principal Office Address': 'principal_office_address',
+    'Business Address': 'business_address',
+    'Official e-mail address': 'official_email',
+    'Alternate Email Address': 'alternate_email',
+    'Official Mobile Number': 'official_mobile',
+    'Alternate Mobile Number': 'alternate_mobile',
+    'Primary Purpose/Industry': 'primary_purpose_industry',
+    'Industry Classification': 'industry_classification',
+    'Geographical Code': 'geographical_code',
+    
+    # Parent/Subsidiary info
+    'Parent Company Name': 'parent_company_name',
+    'Parent Company SEC Reg. No.': 'parent_company_sec_reg_no',
+    'Parent Company Address': 'parent_company_address',
+    'Subsidiary/Affiliate': 'subsidiary_affiliate',
+    'Subsidiary/Affiliate SEC Reg. No.': 'subsidiary_affiliate_sec_reg_no',
+    'Subsidiary/Affiliate Address': 'subsidiary_affiliate_address',
+    
+    # Auditor info
+    'External Auditor': 'external_auditor',
+    'Auditor SEC Accreditation Number': 'auditor_sec_accreditation_number',
+    
+    # AML/AMLA info
+    'Covered Person (AML)': 'covered_person_aml',
+    'AMLA Category 1': 'amla_category_1',
+    'AMLA Category 2': 'amla_category_2',
+    'AMLA Category 3': 'amla_category_3',
+    'AMLA Category 4': 'amla_category_4',
+    'AMLA Category 5': 'amla_category_5',
+    'AMLA Category 6': 'amla_category_6',
+    'AMLA Category 7': 'amla_category_7',
+    'AMLA Category 8': 'amla_category_8',
+    'AMLA Compliance Status': 'amla_compliance_status',
+    
+    # Capital structure (specific mappings)
+    'Auth Capital Stock - Type of Shares 1': 'auth_capital_stock_type_of_shares_1',
+    'Auth Capital Stock - Number of Shares 1': 'auth_capital_stock_number_of_shares_1',
+    'Auth Capital Stock - Par / Stated Value 1': 'auth_capital_stock_par_stated_value_1',
+    'Auth Capital Stock - Amount (PhP) 1': 'auth_capital_stock_amount_php_1',
+    'Authorized Capital Stock': 'auth_capital_stock_amount_php_1',
+    
+    # Filipino Subscribed Capital
+    'Filipino Subscribed Capital - Type of Shares 1': 'filipino_subscribed_capital_type_of_shares_1',
+    'Filipino Subscribed Capital - Number of Shares 1': 'filipino_subscribed_capital_number_of_shares_1',
+    'Filipino Subscribed Capital - Par / Stated Value 1': 'filipino_subscribed_capital_par_stated_value_1',
+    'Filipino Subscribed Capital - Amount (PhP) 1': 'filipino_subscribed_capital_amount_php_1',
+    
+    # Foreign Subscribed Capital
+    'Foreign Subscribed Capital - Type of Shares 1': 'foreign_subscribed_capital_type_of_shares_1',
+    'Foreign Subscribed Capital - Number of Shares 1': 'foreign_subscribed_capital_number_of_shares_1',
+    'Foreign Subscribed Capital - Par / Stated Value 1': 'foreign_subscribed_capital_par_stated_value_1',
+    'Foreign Subscribed Capital - Amount (PhP) 1': 'foreign_subscribed_capital_amount_php_1',
+    
+    # Filipino Paid-Up Capital
+    'Filipino Paid-Up Capital - Type of Shares 1': 'filipino_paid_up_capital_type_of_shares_1',
+    'Filipino Paid-up Capital Number of Shares 1': 'filipino_paid_up_capital_number_of_shares_1',
+    'Filipino Paid-Up Capital - Par / Stated Value 1': 'filipino_paid_up_capital_par_stated_value_1',
+    'Filipino Paid-Up Capital - Amount (PhP) 1': 'filipino_paid_up_capital_amount_php_1',
+    
+    # Foreign Paid-Up Capital
+    'Foreign Paid-Up Capital - Type of Shares 1': 'foreign_paid_up_capital_type_of_shares_1',
+    'Foreign Paid-up Capital Number of Shares 1': 'foreign_paid_up_capital_number_of_shares_1',
+    'Foreign Paid-Up Capital - Par / Stated Value 1': 'foreign_paid_up_capital_par_stated_value_1',
+    'Foreign Paid-Up Capital - Amount (PhP) 1': 'foreign_paid_up_capital_amount_php_1',
+    
+    # Legacy mappings for backward compatibility
+    'Subscribed Capital_Filipino': 'filipino_subscribed_capital_amount_php_1',
+    'Subscribed Capital_Foreign': 'foreign_subscribed_capital_amount_php_1',
+    'Subscribed Capital_% Foreigh Equity': 'subscribed_capital_foreign_equity_percentage',
+    'Subscribed Capital_Total': 'filipino_subscribed_capital_amount_php_1',  # Map to existing field
+    'Paid-up Capital_Filipino': 'filipino_paid_up_capital_amount_php_1',
+    'Paid-up Capital_Foreign': 'foreign_paid_up_capital_amount_php_1',
+    'Paid-up Capital_% Foreigh Equity': 'paid_up_capital_foreign_equity_percentage',
+    'Paid-up Capital_% Foreign Equity': 'paid_up_capital_foreign_equity_percentage',
+    'Paid-Up Capital_Total': 'filipino_paid_up_capital_amount_php_1',  # Map to existing field
+    
+    # Director/Officer fields
+    'Director/Officer_Name': 'director_officer_name',
+    'Director/Officer_Address': 'director_officer_address',
+    'Director/Officer_Nationality': 'director_officer_nationality',
+    'Director/Officer_INC\'R': 'director_officer_inc_r',
+    'Director/Officer_Board': 'director_officer_board',
+    'Director/Officer_Gender': 'director_officer_gender',
+    'Director/Officer_Stock Holder': 'director_officer_stock_holder',
+    'Director/Officer_Officer': 'director_officer_officer',
+    'Director/Officer_Exec Comm.': 'director_officer_exec_comm',
+    'Director/Officer_TIN': 'director_officer_tin',
+    
+    # Stockholder info
+    'Total Number of Stockholders': 'total_number_stockholders',
+    'Number of Stockholders with ≥100 shares': 'number_stockholders_100_plus_shares',
+    'Total Assets (Latest Audited FS)': 'total_assets',
+    
+    # Stockholder details
+    'Stockholder_Name': 'stockholder_name',
+    'Stockholder_Nationality': 'stockholder_nationality',
+    'Stockholder_Address': 'stockholder_address',
+    'Stockholder_Total Shares Subscribed_No.': 'stockholder_shares_subscribed_number',
+    'Stockholder_Total Shares Subscribed_Amount (PHP)': 'stockholder_shares_subscribed_amount',
+    'Stockholder_% of Ownership': 'stockholder_ownership_percentage',
+    'Stockholder_Amount Paid (PHP)': 'stockholder_amount_paid',
+    'Stockholder_TIN': 'stockholder_tin',
+    
+    # Financial info - map to existing fields or mark as truly missing
+    'Subscribed Capital_Total (PHP) (from Stockholder detail pages)': 'filipino_subscribed_capital_amount_php_1',
+    'Paid-Up Capital_Total (PHP) (from Stockholder detail pages)': 'filipino_paid_up_capital_amount_php_1', 
+    'Unrestricted Retained Earnings (PHP)': '',  # Truly missing from JSON
+    'Prior year Dividends_Cash (PHP)': 'prior_year_dividends_cash',
+    'Prior year Dividends_Stock (PHP)': 'prior_year_dividends_stock',
+    'Prior year Dividends_Property (PHP)': 'prior_year_dividends_property',
+    'Prior year Dividends_Total (PHP)': 'prior_year_dividends_total',
+    'Share Issuance_Date': 'share_issuance_date',
+    'Share Issuance_No': 'share_issuance_number',
+    'Share Issuance_Amount (PHP)': 'share_issuance_amount',
+    
+    # License info
+    'SEC License Type': 'sec_license_type',
+    'SEC Licnese Date': 'sec_license_date',
+    'SEC Ops start': 'sec_ops_start',
+    'BSP License Type': 'bsp_license_type',
+    'BSP Licnese Date': 'bsp_license_date',
+    'BSP Ops start': 'bsp_ops_start',
+    'IC License Type': 'ic_license_type',
+    'IC Licnese Date': 'ic_license_date',
+    'IC Ops start': 'ic_ops_start',
+    
+    # Employment/Compensation
+    'Total Comp (PHP)': 'total_compensation',
+    'No Officers': 'number_officers',
+    'No Employees': 'number_employees',
+    'Total Manpower': 'total_manpower',
+    
+    # UBO info
+    'UBO_Name': 'ubo_name',
+    'UBO_Address': 'ubo_address',
+    'UBO_Naitonality': 'ubo_nationality',  # Handle typo in ground truth
+    'UBO_DOB': 'ubo_dob',
+    'UBO_TIN': 'ubo_tin',
+    'UBO_% ownership': 'ubo_ownership_percentage',
+    'UBO_Type': 'ubo_type',
+    'UBO_Category': 'ubo_category',
+    
+    # Additional specific mappings for problematic fields
+    'Director/Officer_INC\'R': 'director_officer_inc_r',
+    'Director/Officer_Exec Comm.': 'director_officer_exec_comm',
+    'Stockholder_Total Shares Subscribed_No.': 'stockholder_shares_subscribed_number',
+    'Stockholder_Total Shares Subscribed_Amount (PHP)': 'stockholder_shares_subscribed_amount',
+    'Stockholder_Amount Paid (PHP)': 'stockholder_amount_paid',
+    'Share Issuance_Date': 'share_issuance_date',
+    'Share Issuance_No': 'share_issuance_number',
+})
+
+# Field names (or prefixes) that are single entries in JSON but repeated in ground truth
+SINGLE_ENTRY_FIELDS = (
+    'UBO_',
+    'Corporate Name',
+    'AMLA Compliance Status',
+    'Subscribed Capital_Total',
+    'Paid-Up Capital_Total',
+    'Total Number of Stockholders',
+    'Number of Stockholders with ≥100 shares',
+    'Total Assets (Latest Audited FS)',
+    'Document Type',
+    'For the year',
+    'Business/Trade Name',
+    'Date Registered',
+    'Fiscal Year End',
+    'SEC Registration Number',
+    'Corporate TIN',
+    'Website/URL',
+    'Principal Office Address',
+    'Business Address',
+    'Official e-mail address',
+    'Alternate Email Address',
+    'Official Mobile Number',
+    'Alternate Mobile Number',
+    'Primary Purpose/Industry',
+    'Industry Classification',
+    'Geographical Code',
+    'Parent Company Name',
+    'Parent Company SEC Reg. No.',
+    'Parent Company Address',
+    'Subsidiary/Affiliate',
+    'Subsidiary/Affiliate SEC Reg. No.',
+    'Subsidiary/Affiliate Address',
+    'External Auditor',
+    'Auditor SEC Accreditation Number',
+    'Covered Person (AML)'
+)
+
+# Single-pass translation tables for the ground truth field name transforms
+_SEPARATORS = str.maketrans({' ': '_', '/': '_', '-': '_'})
+_NORM_TABLE = str.maketrans({' ': '_', '/': '_', '-': '_', '(': None, ')': None, '≥': None, '.': None, "'": None})
+
+@functools.lru_cache(maxsize=4096)
+def normalize_field_name(field_name: str) -> str:
+    """Most comprehensive field name transform, e.g. 'Parent Company SEC Reg. No.' -> 'parent_company_sec_reg_no'."""
+    return field_name.lower().translate(_NORM_TABLE)
+
+@functools.lru_cache(maxsize=4096)
+def candidate_keys(field_name: str) -> Tuple[str, ...]:
+    """Build the ordered, de-duplicated candidate JSON keys for a ground truth field name."""
+    possible_keys = [
+        field_name,  # Exact match
+    ]
+    
+    # Create various field name transformations for better matching
+    base_transforms = [
+        normalize_field_name(field_name),  # Most comprehensive transform
+        field_name.translate(_SEPARATORS),  # Simple transforms
+        field_name.lower().replace(' ', '_'),  # Basic snake case
+        field_name.replace(' ', '').lower(),  # Remove all spaces
+    ]
+    
+    # Check if we have a specific mapping for this field
+    mapped_field = GROUND_TRUTH_FIELD_MAPPINGS.get(field_name)
+    if mapped_field:  # Only add non-empty mappings
+        base_transforms.insert(0, mapped_field)
+    
+    # Add all transformations to possible keys
+    possible_keys.extend(base_transforms)
+    
+    # Remove duplicates while preserving order; interned so field names that
+    # produce the same candidate key share one string
+    return tuple(map(sys.intern, dict.fromkeys(possible_keys)))
+
+# Comparison statuses, best first
+COMPARISON_STATUSES = ("✅ Perfect Match", "🟨 Very Close", "🟧 Similar", "❓ Missing in JSON", "❌ Mismatch")
+
+@functools.lru_cache(maxsize=4096)
+def occurrence_keys(field_name: str, occurrence: int) -> Tuple[str, ...]:
+    """Candidate JSON keys for one occurrence of a ground truth field, numbered key first for repeated sections."""
+    possible_keys = candidate_keys(field_name)
+    
+    # Special handling for fields that appear multiple times (Directors/Officers, Stockholders, etc.)
+    if field_name.startswith(('Director/Officer', 'Stockholder', 'AMLA Category')):
+        # Get the base field mapping first, else use the most comprehensive transform
+        base_key = GROUND_TRUTH_FIELD_MAPPINGS.get(field_name) or normalize_field_name(field_name)
+        # Map to numbered JSON field based on occurrence count
+        possible_keys = (f"{base_key}_{occurrence}",) + possible_keys
+    
+    return possible_keys
 
 def compare_with_ground_truth(flattened_data: Dict[str, Any], ground_truth_df: pd.DataFrame) -> pd.DataFrame:
     """
@@ -382,14 +663,16 @@ def compare_with_ground_truth(flattened_data: Dict[str, Any], ground_truth_df: p
     
     truth_col = value_columns[0]  # Use first value column as ground truth
     
-    comparison_results = []
+    display_fields = []
+    json_values = []
+    truth_values = []
     
     # Track field name occurrences for mapping to numbered JSON fields
     field_counters = {}
     
-    for _, row in ground_truth_df.iterrows():
-        field_name = row['Field']
-        truth_value = normalize_value(row[truth_col])
+    # Walk the two columns directly rather than boxing every row into a Series
+    for field_name, truth_raw in zip(ground_truth_df['Field'].tolist(), ground_truth_df[truth_col].tolist()):
+        truth_value = normalize_value(truth_raw)
         
         # Skip empty rows
         if not field_name or field_name.strip() == "":
@@ -404,251 +687,14 @@ def compare_with_ground_truth(flattened_data: Dict[str, Any], ground_truth_df: p
         # Get corresponding value from flattened JSON
         flattened_value = ""
         
-        # Standard field mapping (no numbers)
-        possible_keys = [
-            field_name,  # Exact match
-        ]
-        
-        # Create various field name transformations for better matching
-        base_transforms = [
-            field_name.lower().replace(' ', '_').replace('/', '_').replace('-', '_').replace('(', '').replace(')', '').replace('≥', '').replace('.', '').replace("'", ''),  # Most comprehensive transform
-            field_name.replace(' ', '_').replace('/', '_').replace('-', '_'),  # Simple transforms
-            field_name.lower().replace(' ', '_'),  # Basic snake case
-            field_name.replace(' ', '').lower(),  # Remove all spaces
-        ]
-        
-        # Add specific field name mappings for common cases
-        field_mappings = {
-            # Basic company info
-            'Document Type': 'document_type',
-            'For the year': 'for_the_year',
-            'Corporate Name': 'business_trade_name',
-            'Business/Trade Name': 'business_trade_name',
-            'Date Registered': 'date_registered',
-            'Fiscal Year End': 'fiscal_year_end',
-            'SEC Registration Number': 'sec_registration_number',
-            'Corporate TIN': 'corporate_tin',
-            'Website/URL': 'website_url',
-            'Principal Office Address': 'principal_office_address',
-            'Business Address': 'business_address',
-            'Official e-mail address': 'official_email',
-            'Alternate Email Address': 'alternate_email',
-            'Official Mobile Number': 'official_mobile',
-            'Alternate Mobile Number': 'alternate_mobile',
-            'Primary Purpose/Industry': 'primary_purpose_industry',
-            'Industry Classification': 'industry_classification',
-            'Geographical Code': 'geographical_code',
-            
-            # Parent/Subsidiary info
-            'Parent Company Name': 'parent_company_name',
-            'Parent Company SEC Reg. No.': 'parent_company_sec_reg_no',
-            'Parent Company Address': 'parent_company_address',
-            'Subsidiary/Affiliate': 'subsidiary_affiliate',
-            'Subsidiary/Affiliate SEC Reg. No.': 'subsidiary_affiliate_sec_reg_no',
-            'Subsidiary/Affiliate Address': 'subsidiary_affiliate_address',
-            
-            # Auditor info
-            'External Auditor': 'external_auditor',
-            'Auditor SEC Accreditation Number': 'auditor_sec_accreditation_number',
-            
-            # AML/AMLA info
-            'Covered Person (AML)': 'covered_person_aml',
-            'AMLA Category 1': 'amla_category_1',
-            'AMLA Category 2': 'amla_category_2',
-            'AMLA Category 3': 'amla_category_3',
-            'AMLA Category 4': 'amla_category_4',
-            'AMLA Category 5': 'amla_category_5',
-            'AMLA Category 6': 'amla_category_6',
-            'AMLA Category 7': 'amla_category_7',
-            'AMLA Category 8': 'amla_category_8',
-            'AMLA Compliance Status': 'amla_compliance_status',
-            
-            # Capital structure (specific mappings)
-            'Auth Capital Stock - Type of Shares 1': 'auth_capital_stock_type_of_shares_1',
-            'Auth Capital Stock - Number of Shares 1': 'auth_capital_stock_number_of_shares_1',
-            'Auth Capital Stock - Par / Stated Value 1': 'auth_capital_stock_par_stated_value_1',
-            'Auth Capital Stock - Amount (PhP) 1': 'auth_capital_stock_amount_php_1',
-            'Authorized Capital Stock': 'auth_capital_stock_amount_php_1',
-            
-            # Filipino Subscribed Capital
-            'Filipino Subscribed Capital - Type of Shares 1': 'filipino_subscribed_capital_type_of_shares_1',
-            'Filipino Subscribed Capital - Number of Shares 1': 'filipino_subscribed_capital_number_of_shares_1',
-            'Filipino Subscribed Capital - Par / Stated Value 1': 'filipino_subscribed_capital_par_stated_value_1',
-            'Filipino Subscribed Capital - Amount (PhP) 1': 'filipino_subscribed_capital_amount_php_1',
-            
-            # Foreign Subscribed Capital
-            'Foreign Subscribed Capital - Type of Shares 1': 'foreign_subscribed_capital_type_of_shares_1',
-            'Foreign Subscribed Capital - Number of Shares 1': 'foreign_subscribed_capital_number_of_shares_1',
-            'Foreign Subscribed Capital - Par / Stated Value 1': 'foreign_subscribed_capital_par_stated_value_1',
-            'Foreign Subscribed Capital - Amount (PhP) 1': 'foreign_subscribed_capital_amount_php_1',
-            
-            # Filipino Paid-Up Capital
-            'Filipino Paid-Up Capital - Type of Shares 1': 'filipino_paid_up_capital_type_of_shares_1',
-            'Filipino Paid-up Capital Number of Shares 1': 'filipino_paid_up_capital_number_of_shares_1',
-            'Filipino Paid-Up Capital - Par / Stated Value 1': 'filipino_paid_up_capital_par_stated_value_1',
-            'Filipino Paid-Up Capital - Amount (PhP) 1': 'filipino_paid_up_capital_amount_php_1',
-            
-            # Foreign Paid-Up Capital
-            'Foreign Paid-Up Capital - Type of Shares 1': 'foreign_paid_up_capital_type_of_shares_1',
-            'Foreign Paid-up Capital Number of Shares 1': 'foreign_paid_up_capital_number_of_shares_1',
-            'Foreign Paid-Up Capital - Par / Stated Value 1': 'foreign_paid_up_capital_par_stated_value_1',
-            'Foreign Paid-Up Capital - Amount (PhP) 1': 'foreign_paid_up_capital_amount_php_1',
-            
-            # Legacy mappings for backward compatibility
-            'Subscribed Capital_Filipino': 'filipino_subscribed_capital_amount_php_1',
-            'Subscribed Capital_Foreign': 'foreign_subscribed_capital_amount_php_1',
-            'Subscribed Capital_% Foreigh Equity': 'subscribed_capital_foreign_equity_percentage',
-            'Subscribed Capital_Total': 'filipino_subscribed_capital_amount_php_1',  # Map to existing field
-            'Paid-up Capital_Filipino': 'filipino_paid_up_capital_amount_php_1',
-            'Paid-up Capital_Foreign': 'foreign_paid_up_capital_amount_php_1',
-            'Paid-up Capital_% Foreigh Equity': 'paid_up_capital_foreign_equity_percentage',
-            'Paid-up Capital_% Foreign Equity': 'paid_up_capital_foreign_equity_percentage',
-            'Paid-Up Capital_Total': 'filipino_paid_up_capital_amount_php_1',  # Map to existing field
-            
-            # Director/Officer fields
-            'Director/Officer_Name': 'director_officer_name',
-            'Director/Officer_Address': 'director_officer_address',
-            'Director/Officer_Nationality': 'director_officer_nationality',
-            'Director/Officer_INC\'R': 'director_officer_inc_r',
-            'Director/Officer_Board': 'director_officer_board',
-            'Director/Officer_Gender': 'director_officer_gender',
-            'Director/Officer_Stock Holder': 'director_officer_stock_holder',
-            'Director/Officer_Officer': 'director_officer_officer',
-            'Director/Officer_Exec Comm.': 'director_officer_exec_comm',
-            'Director/Officer_TIN': 'director_officer_tin',
-            
-            # Stockholder info
-            'Total Number of Stockholders': 'total_number_stockholders',
-            'Number of Stockholders with ≥100 shares': 'number_stockholders_100_plus_shares',
-            'Total Assets (Latest Audited FS)': 'total_assets',
-            
-            # Stockholder details
-            'Stockholder_Name': 'stockholder_name',
-            'Stockholder_Nationality': 'stockholder_nationality',
-            'Stockholder_Address': 'stockholder_address',
-            'Stockholder_Total Shares Subscribed_No.': 'stockholder_shares_subscribed_number',
-            'Stockholder_Total Shares Subscribed_Amount (PHP)': 'stockholder_shares_subscribed_amount',
-            'Stockholder_% of Ownership': 'stockholder_ownership_percentage',
-            'Stockholder_Amount Paid (PHP)': 'stockholder_amount_paid',
-            'Stockholder_TIN': 'stockholder_tin',
-            
-            # Financial info - map to existing fields or mark as truly missing
-            'Subscribed Capital_Total (PHP) (from Stockholder detail pages)': 'filipino_subscribed_capital_amount_php_1',
-            'Paid-Up Capital_Total (PHP) (from Stockholder detail pages)': 'filipino_paid_up_capital_amount_php_1', 
-            'Unrestricted Retained Earnings (PHP)': '',  # Truly missing from JSON
-            'Prior year Dividends_Cash (PHP)': 'prior_year_dividends_cash',
-            'Prior year Dividends_Stock (PHP)': 'prior_year_dividends_stock',
-            'Prior year Dividends_Property (PHP)': 'prior_year_dividends_property',
-            'Prior year Dividends_Total (PHP)': 'prior_year_dividends_total',
-            'Share Issuance_Date': 'share_issuance_date',
-            'Share Issuance_No': 'share_issuance_number',
-            'Share Issuance_Amount (PHP)': 'share_issuance_amount',
-            
-            # License info
-            'SEC License Type': 'sec_license_type',
-            'SEC Licnese Date': 'sec_license_date',
-            'SEC Ops start': 'sec_ops_start',
-            'BSP License Type': 'bsp_license_type',
-            'BSP Licnese Date': 'bsp_license_date',
-            'BSP Ops start': 'bsp_ops_start',
-            'IC License Type': 'ic_license_type',
-            'IC Licnese Date': 'ic_license_date',
-            'IC Ops start': 'ic_ops_start',
-            
-            # Employment/Compensation
-            'Total Comp (PHP)': 'total_compensation',
-            'No Officers': 'number_officers',
-            'No Employees': 'number_employees',
-            'Total Manpower': 'total_manpower',
-            
-            # UBO info
-            'UBO_Name': 'ubo_name',
-            'UBO_Address': 'ubo_address',
-            'UBO_Naitonality': 'ubo_nationality',  # Handle typo in ground truth
-            'UBO_DOB': 'ubo_dob',
-            'UBO_TIN': 'ubo_tin',
-            'UBO_% ownership': 'ubo_ownership_percentage',
-            'UBO_Type': 'ubo_type',
-            'UBO_Category': 'ubo_category',
-            
-            # Additional specific mappings for problematic fields
-            'Director/Officer_INC\'R': 'director_officer_inc_r',
-            'Director/Officer_Exec Comm.': 'director_officer_exec_comm',
-            'Stockholder_Total Shares Subscribed_No.': 'stockholder_shares_subscribed_number',
-            'Stockholder_Total Shares Subscribed_Amount (PHP)': 'stockholder_shares_subscribed_amount',
-            'Stockholder_Amount Paid (PHP)': 'stockholder_amount_paid',
-            'Share Issuance_Date': 'share_issuance_date',
-            'Share Issuance_No': 'share_issuance_number',
-        }
-        
-        # Check if we have a specific mapping for this field
-        if field_name in field_mappings:
-            mapped_field = field_mappings[field_name]
-            if mapped_field:  # Only add non-empty mappings
-                base_transforms.insert(0, mapped_field)
-        
-        # Add all transformations to possible keys
-        possible_keys.extend(base_transforms)
-        
-        # Remove duplicates while preserving order
-        seen = set()
-        possible_keys = [x for x in possible_keys if not (x in seen or seen.add(x))]
-        
-        # Special handling for fields that appear multiple times (Directors/Officers, Stockholders, etc.)
-        if field_name.startswith(('Director/Officer', 'Stockholder', 'AMLA Category')):
-            # Get the base field mapping first
-            if field_name in field_mappings and field_mappings[field_name]:
-                base_mapped = field_mappings[field_name]
-                numbered_key = f"{base_mapped}_{current_count}"
-                possible_keys.insert(0, numbered_key)
-            else:
-                # Use the most comprehensive transform for numbered fields
-                base_key = field_name.lower().replace(' ', '_').replace('/', '_').replace('-', '_').replace('(', '').replace(')', '').replace('≥', '').replace('.', '').replace("'", '')
-                # Map to numbered JSON field based on occurrence count
-                numbered_key = f"{base_key}_{current_count}"
-                possible_keys.insert(0, numbered_key)
+        # Candidate keys, derived once per (field name, occurrence)
+        possible_keys = occurrence_keys(field_name, current_count)
         
         # Special handling for fields that are single entries in JSON but repeated in ground truth
-        single_entry_fields = [
-            'UBO_', 
-            'Corporate Name', 
-            'AMLA Compliance Status',
-            'Subscribed Capital_Total',
-            'Paid-Up Capital_Total',
-            'Total Number of Stockholders',
-            'Number of Stockholders with ≥100 shares',
-            'Total Assets (Latest Audited FS)',
-            'Document Type',
-            'For the year',
-            'Business/Trade Name',
-            'Date Registered',
-            'Fiscal Year End',
-            'SEC Registration Number',
-            'Corporate TIN',
-            'Website/URL',
-            'Principal Office Address',
-            'Business Address',
-            'Official e-mail address',
-            'Alternate Email Address',
-            'Official Mobile Number',
-            'Alternate Mobile Number',
-            'Primary Purpose/Industry',
-            'Industry Classification',
-            'Geographical Code',
-            'Parent Company Name',
-            'Parent Company SEC Reg. No.',
-            'Parent Company Address',
-            'Subsidiary/Affiliate',
-            'Subsidiary/Affiliate SEC Reg. No.',
-            'Subsidiary/Affiliate Address',
-            'External Auditor',
-            'Auditor SEC Accreditation Number',
-            'Covered Person (AML)'
-        ]
-        if any(field_name.startswith(prefix) or field_name == prefix for prefix in single_entry_fields) and current_count > 1:
+        if current_count > 1 and field_name.startswith(SINGLE_ENTRY_FIELDS):
             flattened_value = ""  # These fields beyond first occurrence are empty/missing in JSON
         # Check if field is explicitly marked as missing
-        elif field_name in field_mappings and field_mappings[field_name] == '':
+        elif field_name in GROUND_TRUTH_FIELD_MAPPINGS and GROUND_TRUTH_FIELD_MAPPINGS[field_name] == '':
             flattened_value = ""  # Explicitly missing
         else:
             # Try to find matching JSON field
@@ -657,38 +703,48 @@ def compare_with_ground_truth(flattened_data: Dict[str, Any], ground_truth_df: p
                     flattened_value = normalize_value(flattened_data[key])
                     break
         
-        # Calculate similarity score
-        flattened_vs_truth = similarity_score(flattened_value, truth_value)
-        
-        # Determine match status
-        exact_match = flattened_value == truth_value
-        
-        # Overall status
-        if exact_match:
-            status = "✅ Perfect Match"
-        elif flattened_vs_truth > 0.9:
-            status = "🟨 Very Close"
-        elif flattened_vs_truth > 0.7:
-            status = "🟧 Similar"
-        elif flattened_value == "":
-            status = "❓ Missing in JSON"
-        else:
-            status = "❌ Mismatch"
-        
         # Create display field name with occurrence indicator for repeated fields
         display_field = field_name
         if current_count > 1:
             display_field = f"{field_name} ({current_count})"
         
-        comparison_results.append({
-            'Field': display_field,
-            'JSON Value': flattened_value,
-            'Ground Truth': truth_value,
-            'Status': status,
-            'Similarity Score': f"{flattened_vs_truth:.2%}"
-        })
+        display_fields.append(display_field)
+        json_values.append(flattened_value)
+        truth_values.append(truth_value)
     
-    return pd.DataFrame(comparison_results)
+    if not display_fields:
+        return pd.DataFrame()
+    
+    # Score every row in one batch call when rapidfuzz is installed
+    if rapidfuzz_process is not None:
+        scores = rapidfuzz_process.cpdist(
+            [value.lower() for value in json_values],
+            [value.lower() for value in truth_values],
+            scorer=fuzz.ratio,
+            workers=-1
+        ) / 100.0
+    else:
+        scores = [similarity_score(json_value, truth_value) for json_value, truth_value in zip(json_values, truth_values)]
+    
+    comparison_df = pd.DataFrame({
+        'Field': display_fields,
+        'JSON Value': json_values,
+        'Ground Truth': truth_values
+    })
+    similarity = pd.Series(scores, index=comparison_df.index, dtype=float)
+    
+    # Overall status as COMPARISON_STATUSES codes, applied lowest precedence first so later masks win
+    status_codes = pd.Series(4, index=comparison_df.index)
+    status_codes = status_codes.mask(comparison_df['JSON Value'] == "", 3)
+    status_codes = status_codes.mask(similarity > 0.7, 2)
+    status_codes = status_codes.mask(similarity > 0.9, 1)
+    status_codes = status_codes.mask(comparison_df['JSON Value'] == comparison_df['Ground Truth'], 0)
+    
+    # Stored as a categorical: integer codes internally, the labels when displayed or exported
+    comparison_df['Status'] = pd.Categorical.from_codes(status_codes, categories=COMPARISON_STATUSES)
+    # Kept numeric and formatted as a percentage only when displayed
+    comparison_df['Similarity Score'] = similarity
+    return comparison_df
 
 def create_comparison_summary(comparison_df: pd.DataFrame) -> Dict[str, Any]:
     """Create a summary of comparison results."""
@@ -696,11 +752,14 @@ def create_comparison_summary(comparison_df: pd.DataFrame) -> Dict[str, Any]:
         return {}
     
     total_fields = len(comparison_df)
-    perfect_matches = len(comparison_df[comparison_df['Status'] == '✅ Perfect Match'])
-    very_close = len(comparison_df[comparison_df['Status'] == '🟨 Very Close'])
-    similar = len(comparison_df[comparison_df['Status'] == '🟧 Similar'])
-    missing = len(comparison_df[comparison_df['Status'] == '❓ Missing in JSON'])
-    mismatches = len(comparison_df[comparison_df['Status'] == '❌ Mismatch'])
+    
+    # Count every status in one pass over the column
+    status_counts = comparison_df['Status'].value_counts()
+    perfect_matches = int(status_counts.get('✅ Perfect Match', 0))
+    very_close = int(status_counts.get('🟨 Very Close', 0))
+    similar = int(status_counts.get('🟧 Similar', 0))
+    missing = int(status_counts.get('❓ Missing in JSON', 0))
+    mismatches = int(status_counts.get('❌ Mismatch', 0))
     
     return {
         'total_fields': total_fields,
@@ -720,19 +779,22 @@ def create_download_files(flattened_data: Dict[str, Any], filename_base: str, se
     if sec_gis_data:
         print(f"DEBUG: SEC GIS data has {len(sec_gis_data)} fields")
     
-    # Create DataFrame for standard flattened data
-    df = pd.DataFrame([
-        {'Field': format_field_name(field), 'Value': str(value) if value is not None else 'null'}
-        for field, value in flattened_data.items()
-    ])
+    # Create DataFrame for standard flattened data; field names are formatted once
+    # through the cached format_field_name and shared with the JSON export
+    field_names = list(map(format_field_name, flattened_data))
+    df = pd.DataFrame({
+        'Field': field_names,
+        'Value': [str(value) if value is not None else 'null' for value in flattened_data.values()]
+    })
     
     # Create DataFrame for SEC GIS format if provided
     sec_gis_df = None
     if sec_gis_data:
-        sec_gis_df = pd.DataFrame([
-            {'Field': field, 'Value': str(value) if value is not None else ''}
-            for field, value in sec_gis_data.items()
-        ])
+        # Built column-wise: the mapping's keys are already the Field column in SEC GIS order
+        sec_gis_df = pd.DataFrame({
+            'Field': list(sec_gis_data),
+            'Value': [str(value) if value is not None else '' for value in sec_gis_data.values()]
+        })
         print(f"DEBUG: SEC GIS DataFrame created with {len(sec_gis_df)} rows")
     
     # TSV content
@@ -743,39 +805,14 @@ def create_download_files(flattened_data: Dict[str, Any], filename_base: str, se
     csv_content = df.to_csv(index=False)
     sec_gis_csv = sec_gis_df.to_csv(index=False) if sec_gis_df is not None else None
     
-    # Excel content - with error handling
-    excel_content = None
-    sec_gis_excel = None
-    try:
-        excel_buffer = io.BytesIO()
-        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='Flattened_Data', index=False)
-            if sec_gis_df is not None:
-                sec_gis_df.to_excel(writer, sheet_name='SEC_GIS_Format', index=False)
-        excel_content = excel_buffer.getvalue()
-        
-        if sec_gis_df is not None:
-            sec_gis_excel_buffer = io.BytesIO()
-            with pd.ExcelWriter(sec_gis_excel_buffer, engine='openpyxl') as writer:
-                sec_gis_df.to_excel(writer, sheet_name='SEC_GIS_Format', index=False)
-            sec_gis_excel = sec_gis_excel_buffer.getvalue()
-            print("DEBUG: SEC GIS Excel created successfully")
-            
-    except ImportError:
-        # If openpyxl is not available, create a simple Excel-compatible CSV
-        excel_content = csv_content.encode('utf-8')
-        sec_gis_excel = sec_gis_csv.encode('utf-8') if sec_gis_csv else None
-        print("DEBUG: Using fallback Excel format (CSV)")
+    # Excel workbooks are built by build_xlsx only when an Excel download is clicked
     
     # JSON content (flattened)
-    json_content = json.dumps({
-        format_field_name(field): value for field, value in flattened_data.items()
-    }, indent=2, ensure_ascii=False)
+    json_content = json.dumps(dict(zip(field_names, flattened_data.values())), indent=2, ensure_ascii=False)
     
     result = {
         'tsv': tsv_content,
         'csv': csv_content, 
-        'excel': excel_content,
         'json': json_content,
         'dataframe': df
     }
@@ -785,7 +822,6 @@ def create_download_files(flattened_data: Dict[str, Any], filename_base: str, se
         result.update({
             'sec_gis_tsv': sec_gis_tsv,
             'sec_gis_csv': sec_gis_csv,
-            'sec_gis_excel': sec_gis_excel,
             'sec_gis_dataframe': sec_gis_df
         })
         print(f"DEBUG: Added SEC GIS data to result. Keys: {list(result.keys())}")
@@ -794,6 +830,104 @@ def create_download_files(flattened_data: Dict[str, Any], filename_base: str, se
     
     return result
 
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_xlsx(df: pd.DataFrame = None, sec_gis_df: pd.DataFrame = None) -> bytes:
+    """Build an Excel workbook on demand from the standard and/or SEC GIS DataFrames."""
+    sheets = [
+        (sheet_name, frame)
+        for sheet_name, frame in (('Flattened_Data', df), ('SEC_GIS_Format', sec_gis_df))
+        if frame is not None
+    ]
+    excel_buffer = io.BytesIO()
+    
+    if xlsxwriter is not None:
+        # Stream rows out in constant-memory mode. Rows are written strictly in order,
+        # which that mode requires (pandas' to_excel writes column by column)
+        workbook = xlsxwriter.Workbook(excel_buffer, {
+            'constant_memory': True,
+            'strings_to_urls': False,
+            'strings_to_formulas': False
+        })
+        for sheet_name, frame in sheets:
+            worksheet = workbook.add_worksheet(sheet_name)
+            worksheet.write_row(0, 0, list(frame.columns))
+            for row_number, row in enumerate(frame.itertuples(index=False, name=None), start=1):
+                worksheet.write_row(row_number, 0, row)
+        workbook.close()
+    else:
+        with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
+            for sheet_name, frame in sheets:
+                frame.to_excel(writer, sheet_name=sheet_name, index=False)
+    
+    return excel_buffer.getvalue()
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_download_files(source: Union[str, bytes], filename_base: str, with_sec_gis: bool, _flattened: Dict[str, Any], _parsed: Any = None) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Builds the SEC GIS mapping (when requested) and the download files for flattened data.
+    Cached on the raw JSON input, which hashes far cheaper than the flattened or parsed dict.
+    """
+    sec_gis_data = map_sec_gis_fields(source, _parsed) if with_sec_gis else None
+    return sec_gis_data, create_download_files(_flattened, filename_base, sec_gis_data)
+
+def comparison_rows(comparison_df: pd.DataFrame) -> Tuple[List[str], List[tuple]]:
+    """
+    Materializes the comparison header and row tuples for the CSV, TSV and Excel writers.
+    Zipping the column arrays keeps each column's numpy dtype, so values print as to_csv's do.
+    """
+    header = list(comparison_df.columns)
+    return header, list(zip(*(comparison_df[column].to_numpy() for column in header)))
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_comparison_downloads(comparison_df: pd.DataFrame) -> Dict[str, str]:
+    """Serializes the comparison results to CSV and TSV once per distinct comparison."""
+    header, rows = comparison_rows(comparison_df)
+    
+    csv_buffer = io.StringIO()
+    tsv_buffer = io.StringIO()
+    csv_writer = csv.writer(csv_buffer, lineterminator='\n')
+    tsv_writer = csv.writer(tsv_buffer, dialect=csv.excel_tab, lineterminator='\n')
+    csv_writer.writerow(header)
+    csv_writer.writerows(rows)
+    tsv_writer.writerow(header)
+    tsv_writer.writerows(rows)
+    
+    return {
+        'csv': csv_buffer.getvalue(),
+        'tsv': tsv_buffer.getvalue()
+    }
+
+@st.cache_data(max_entries=32, show_spinner=False)
+def build_comparison_xlsx(comparison_df: pd.DataFrame) -> bytes:
+    """Build the comparison Excel workbook on demand."""
+    header, rows = comparison_rows(comparison_df)
+    excel_buffer = io.BytesIO()
+    
+    if xlsxwriter is not None:
+        # Constant-memory mode flushes each row as it is written, like build_xlsx
+        workbook = xlsxwriter.Workbook(excel_buffer, {
+            'constant_memory': True,
+            'strings_to_urls': False,
+            'strings_to_formulas': False
+        })
+        worksheet = workbook.add_worksheet('Comparison_Results')
+        worksheet.write_row(0, 0, header)
+        for row_number, row in enumerate(rows, start=1):
+            worksheet.write_row(row_number, 0, row)
+        workbook.close()
+    else:
+        from openpyxl import Workbook
+        
+        # Write-only mode streams rows to the file instead of building every cell up front
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet('Comparison_Results')
+        worksheet.append(header)
+        for row in rows:
+            worksheet.append(row)
+        workbook.save(excel_buffer)
+    
+    return excel_buffer.getvalue()
+
 def main():
     """Main Streamlit app."""
     
@@ -801,12 +935,13 @@ def main():
     st.title("📊 GIS JSON Flattener")
     st.markdown("Convert nested JSON data (including arrays and objects) into flat spreadsheet format")
     
-    # Check for missing dependencies
+    # Check for missing dependencies - either Excel engine will do
     try:
         import openpyxl
         excel_available = True
     except ImportError:
-        excel_available = False
+        excel_available = xlsxwriter is not None
+    if not excel_available:
         st.warning("⚠️ Excel export requires openpyxl. Add 'openpyxl>=3.1.0' to requirements.txt for full functionality. TSV and CSV work perfectly!")
     
     # Sidebar
@@ -872,29 +1007,30 @@ def main():
         
         if json_text.strip():
             try:
-                # Validate JSON
-                json_data = json.loads(json_text)
+                # Validate JSON - parsed once here and handed to the helpers below. They are
+                # cached on the raw text, which hashes far cheaper than the parsed dict
+                json_data = load_json(json_text)
                 st.success("✅ Valid JSON detected")
                 
                 col1, col2 = st.columns([1, 1])
                 
                 with col1:
-                    analysis = analyze_json_structure(json_data)
+                    analysis = analyze_json_structure(json_text, json_data)
                     st.metric("Arrays", len(analysis['arrays']))
                     st.metric("Nested Objects", len(analysis['nested_objects']))
                     st.metric("Fields", analysis['primitive_fields'])
                 
                 with col2:
                     if st.button("🚀 Flatten Pasted JSON", type="primary"):
-                        flattened = flatten_json_data(json_data)
+                        flattened = flatten_json_data(json_text, json_data)
                         
                         # Check if this looks like SEC GIS data
-                        sec_gis_data = None
-                        if any(key in json_data for key in ['corporate_name', 'sec_registration_number', 'director_officer_name_1', 'business_trade_name', 'document_type']):
-                            sec_gis_data = map_sec_gis_fields(json_data)
+                        is_sec_gis = any(key in json_data for key in ['corporate_name', 'sec_registration_number', 'director_officer_name_1', 'business_trade_name', 'document_type'])
+                        if is_sec_gis:
                             st.info("🏢 SEC GIS format detected! Philippine SEC format available.")
                         
-                        files = create_download_files(flattened, "pasted_json", sec_gis_data)
+                        # Mapping and serialized files are cached on the pasted text
+                        sec_gis_data, files = build_download_files(json_text, "pasted_json", is_sec_gis, flattened, json_data)
                         
                         st.success(f"✅ Flattened into **{len(flattened)} fields**")
                         if sec_gis_data:
@@ -936,12 +1072,12 @@ def main():
                         col1, col2 = st.columns(2)
                         
                         with col1:
-                            tsv_component = create_clipboard_component(
+                            create_clipboard_component(
                                 active_tsv,
                                 "📝 Copy",
-                                f"{format_name} Copied!"
+                                f"{format_name} Copied!",
+                                key="paste_copy"
                             )
-                            components.html(tsv_component, height=70)
                             
                             
                         
@@ -964,29 +1100,25 @@ def main():
                             )
                         
                         with col3:
-                            if sec_gis_data and files.get('sec_gis_excel'):
-                                try:
-                                    excel_data = files['sec_gis_excel'] if format_name == "SEC GIS" else files['excel']
-                                    if excel_data and len(excel_data) > len(active_csv):
-                                        st.download_button(
-                                            label="📊 Excel",
-                                            data=excel_data,
-                                            file_name=f"pasted_json_{format_name.lower()}_flattened.xlsx"
-                                        )
-                                    else:
-                                        st.download_button(
-                                            label="📊 CSV (Excel)",
-                                            data=active_csv,
-                                            file_name=f"pasted_json_{format_name.lower()}_flattened.csv",
-                                            help="Excel format not available"
-                                        )
-                                except:
-                                    st.download_button(
-                                        label="📊 CSV (Excel)",
-                                        data=active_csv,
-                                        file_name=f"pasted_json_{format_name.lower()}_flattened.csv",
-                                        help="Excel format not available"
-                                    )
+                            if sec_gis_data and excel_available:
+                                # The workbook is only built when this download is clicked
+                                if format_name == "SEC GIS":
+                                    excel_data = functools.partial(build_xlsx, sec_gis_df=files['sec_gis_dataframe'])
+                                else:
+                                    excel_data = functools.partial(build_xlsx, files['dataframe'], files['sec_gis_dataframe'])
+                                st.download_button(
+                                    label="📊 Excel",
+                                    data=excel_data,
+                                    file_name=f"pasted_json_{format_name.lower()}_flattened.xlsx",
+                                    on_click="ignore"
+                                )
+                            elif sec_gis_data:
+                                st.download_button(
+                                    label="📊 CSV (Excel)",
+                                    data=active_csv,
+                                    file_name=f"pasted_json_{format_name.lower()}_flattened.csv",
+                                    help="Excel format not available"
+                                )
                             else:
                                 st.download_button(
                                     label="📊 CSV (Excel)",
@@ -1020,14 +1152,12 @@ def main():
                 help="Paste JSON data directly for comparison"
             )
             
-            json_data = None
             flattened_json = None
             
             if json_file:
                 try:
-                    json_content = json_file.read().decode('utf-8')
-                    json_data = json.loads(json_content)
-                    flattened_json = flatten_json_data(json_data)
+                    # Flatten the raw bytes directly, no UTF-8 decode pass
+                    flattened_json = flatten_json_data(json_file.getvalue())
                     
                     st.success(f"✅ JSON loaded: {len(flattened_json)} fields")
                     
@@ -1043,8 +1173,7 @@ def main():
             
             elif json_text.strip():
                 try:
-                    json_data = json.loads(json_text)
-                    flattened_json = flatten_json_data(json_data)
+                    flattened_json = flatten_json_data(json_text)
                     
                     st.success(f"✅ JSON parsed: {len(flattened_json)} fields")
                     
@@ -1055,7 +1184,7 @@ def main():
                         if len(flattened_json) > 10:
                             st.caption(f"Showing first 10 fields. Total: {len(flattened_json)} fields.")
                     
-                except json.JSONDecodeError as e:
+                except ValueError as e:
                     st.error(f"❌ Invalid JSON: {e}")
                 except Exception as e:
                     st.error(f"❌ Error parsing JSON: {e}")
@@ -1104,7 +1233,7 @@ def main():
                     st.error(f"❌ Error parsing ground truth: {e}")
         
         # Perform comparison if both files are loaded
-        if json_data is not None and flattened_json is not None and ground_truth_df is not None and not ground_truth_df.empty:
+        if flattened_json is not None and ground_truth_df is not None and not ground_truth_df.empty:
             st.markdown("---")
             st.subheader("🎯 Comparison Results")
             
@@ -1154,7 +1283,7 @@ def main():
                         with filter_col1:
                             status_filter = st.selectbox(
                                 "Filter by status:",
-                                ["All", "✅ Perfect Match", "🟨 Very Close", "🟧 Similar", "❓ Missing in JSON", "❌ Mismatch"],
+                                ["All", *COMPARISON_STATUSES],
                                 key="status_filter"
                             )
                         
@@ -1174,7 +1303,7 @@ def main():
                         
                         # Display the comparison table
                         st.dataframe(
-                            display_df,
+                            display_df.style.format({'Similarity Score': '{:.2%}'}),
                             use_container_width=True,
                             height=400
                         )
@@ -1184,34 +1313,31 @@ def main():
                         # Download comparison results
                         st.subheader("⬇️ Download Comparison Results")
                         
+                        downloads = build_comparison_downloads(comparison_df)
                         col1, col2, col3 = st.columns(3)
                         
                         with col1:
-                            csv_data = comparison_df.to_csv(index=False)
                             st.download_button(
                                 label="📄 Download CSV",
-                                data=csv_data,
+                                data=downloads['csv'],
                                 file_name=f"comparison_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                                 mime="text/csv"
                             )
                         
                         with col2:
-                            try:
-                                excel_buffer = io.BytesIO()
-                                with pd.ExcelWriter(excel_buffer, engine='openpyxl') as writer:
-                                    comparison_df.to_excel(writer, sheet_name='Comparison_Results', index=False)
-                                excel_data = excel_buffer.getvalue()
-                                
+                            if excel_available:
+                                # The workbook is only built when this download is clicked
                                 st.download_button(
                                     label="📊 Download Excel",
-                                    data=excel_data,
+                                    data=functools.partial(build_comparison_xlsx, comparison_df),
                                     file_name=f"comparison_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+                                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                                    on_click="ignore"
                                 )
-                            except:
+                            else:
                                 st.download_button(
                                     label="📊 Download CSV (Excel)",
-                                    data=csv_data,
+                                    data=downloads['csv'],
                                     file_name=f"comparison_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
                                     mime="text/csv",
                                     help="Excel format not available"
@@ -1219,13 +1345,12 @@ def main():
                         
                         with col3:
                             # Copy to clipboard functionality
-                            tsv_data = comparison_df.to_csv(sep='\t', index=False)
-                            copy_component = create_clipboard_component(
-                                tsv_data,
+                            create_clipboard_component(
+                                downloads['tsv'],
                                 "📝 Copy TSV",
-                                "Comparison copied!"
+                                "Comparison copied!",
+                                key="comparison_copy"
                             )
-                            components.html(copy_component, height=70)
                         
                         # Insights and recommendations
                         st.subheader("💡 Insights & Recommendations")
@@ -1,56 +1,85 @@
 import streamlit as st
 from PIL import Image
 import io
+import hashlib
 from fpdf import FPDF
-import tempfile
 import os
+from concurrent.futures import ThreadPoolExecutor
 
+# Pixel to millimetre conversion at 96 DPI
+PX_TO_MM = 0.264583
 
-def images_to_pdf(images, output_path):
-    """Convert multiple images to a single PDF file."""
-    pdf = FPDF()
+# Pages never need more pixels than this resolution of their placed size
+PRINT_DPI = 300
 
-    for img in images:
-        # Open image using PIL
-        pil_img = Image.open(img)
 
-        # Convert RGBA to RGB if necessary
-        if pil_img.mode == 'RGBA':
-            pil_img = pil_img.convert('RGB')
+def encode_page(img):
+    """Decode, fit and JPEG-encode one image, returning its buffer and A4 placement."""
+    # Open image using PIL
+    pil_img = Image.open(img)
 
-        # Save to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.jpg') as tmp_file:
-            pil_img.save(tmp_file.name, 'JPEG')
-            tmp_path = tmp_file.name
+    # Convert RGBA to RGB if necessary
+    if pil_img.mode == 'RGBA':
+        pil_img = pil_img.convert('RGB')
 
-        # Get image dimensions
-        width, height = pil_img.size
+    # Get image dimensions
+    width, height = pil_img.size
 
-        # Calculate PDF page size (A4 or image size)
-        pdf.add_page()
+    # Calculate dimensions to fit page while maintaining aspect ratio
+    page_width = 210  # A4 width in mm
+    page_height = 297  # A4 height in mm
+
+    # Calculate scaling factor
+    width_ratio = page_width / (width * PX_TO_MM)  # Convert pixels to mm
+    height_ratio = page_height / (height * PX_TO_MM)
+    ratio = min(width_ratio, height_ratio)
+
+    img_width = width * PX_TO_MM * ratio
+    img_height = height * PX_TO_MM * ratio
+
+    # Center the image on the page
+    x = (page_width - img_width) / 2
+    y = (page_height - img_height) / 2
+
+    # Downscale images larger than the placed size needs at PRINT_DPI. A reducing_gap
+    # of 1.0 lets JPEG sources shrink during decode via libjpeg's DCT scaling
+    target_width = max(1, int(img_width / 25.4 * PRINT_DPI))
+    target_height = max(1, int(img_height / 25.4 * PRINT_DPI))
+    pil_img.thumbnail((target_width, target_height), reducing_gap=1.0)
 
-        # Calculate dimensions to fit page while maintaining aspect ratio
-        page_width = 210  # A4 width in mm
-        page_height = 297  # A4 height in mm
+    # Encode to an in-memory JPEG that FPDF reads directly
+    jpeg_buffer = io.BytesIO()
+    pil_img.save(jpeg_buffer, 'JPEG')
+    jpeg_buffer.seek(0)
 
-        # Calculate scaling factor
-        width_ratio = page_width / (width * 0.264583)  # Convert pixels to mm
-        height_ratio = page_height / (height * 0.264583)
-        ratio = min(width_ratio, height_ratio)
+    return jpeg_buffer, x, y, img_width, img_height
 
-        img_width = width * 0.264583 * ratio
-        img_height = height * 0.264583 * ratio
 
-        # Center the image on the page
-        x = (page_width - img_width) / 2
-        y = (page_height - img_height) / 2
+def images_to_pdf(images):
+    """Convert multiple images to a single PDF and return its bytes."""
+    # Identical uploads (repeated covers, dividers) are only encoded once
+    unique_images = {}
+    page_keys = []
+    for img in images:
+        key = hashlib.blake2b(img.read(), digest_size=16).digest()
+        img.seek(0)
+        unique_images.setdefault(key, img)
+        page_keys.append(key)
+
+    # PIL releases the GIL while decoding, resizing and encoding, so pages are
+    # prepared in parallel; FPDF itself is not thread-safe and stays sequential
+    with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+        pages = dict(zip(unique_images, executor.map(encode_page, unique_images.values())))
 
-        pdf.image(tmp_path, x=x, y=y, w=img_width, h=img_height)
+    pdf = FPDF()
 
-        # Clean up temporary file
-        os.unlink(tmp_path)
+    for key in page_keys:
+        jpeg_buffer, x, y, img_width, img_height = pages[key]
+        jpeg_buffer.seek(0)
+        pdf.add_page()
+        pdf.image(jpeg_buffer, x=x, y=y, w=img_width, h=img_height)
 
-    pdf.output(output_path)
+    return bytes(pdf.output())
 
 
 def main():
@@ -69,12 +98,12 @@ def main():
     if uploaded_files:
         st.write(f"**{len(uploaded_files)} image(s) uploaded**")
 
-        # Display thumbnails
+        # Display thumbnails from the raw upload bytes; Streamlit only decodes them to
+        # shrink oversized images, leaving the one full decode to images_to_pdf
         cols = st.columns(min(len(uploaded_files), 4))
         for idx, uploaded_file in enumerate(uploaded_files):
             with cols[idx % 4]:
-                image = Image.open(uploaded_file)
-                st.image(image, caption=uploaded_file.name, use_container_width=True)
+                st.image(uploaded_file.getvalue(), caption=uploaded_file.name, use_container_width=True)
 
         # PDF filename input - default to first uploaded file's name
         default_name = os.path.splitext(uploaded_files[0].name)[0]
@@ -87,23 +116,12 @@ def main():
         if st.button("Convert to PDF", type="primary"):
             try:
                 with st.spinner("Converting images to PDF..."):
-                    # Create temporary PDF file
-                    with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as tmp_pdf:
-                        output_path = tmp_pdf.name
-
                     # Reset file pointers
                     for f in uploaded_files:
                         f.seek(0)
 
-                    # Convert images to PDF
-                    images_to_pdf(uploaded_files, output_path)
-
-                    # Read the PDF file
-                    with open(output_path, 'rb') as f:
-                        pdf_data = f.read()
-
-                    # Clean up temporary file
-                    os.unlink(output_path)
+                    # Convert images to PDF in memory
+                    pdf_data = images_to_pdf(uploaded_files)
 
                     st.success("✅ PDF created successfully!")
 
@@ -2,7 +2,12 @@
 """
 Test script to verify field name mappings work correctly
 """
+import functools
 
+# Single-pass table for the most comprehensive transform
+_TRANSFORM_TABLE = str.maketrans({' ': '_', '/': '_', '-': '_', '(': '', ')': '', '≥': '', '.': '', "'": ''})
+
+@functools.lru_cache(maxsize=4096)
 def create_field_transforms(field_name):
     """Test the field transformation logic"""
     possible_keys = [
@@ -11,7 +16,7 @@ def create_field_transforms(field_name):
     
     # Create various field name transformations for better matching
     base_transforms = [
-        field_name.lower().replace(' ', '_').replace('/', '_').replace('-', '_').replace('(', '').replace(')', '').replace('≥', '').replace('.', '').replace("'", ''),  # Most comprehensive transform
+        field_name.lower().translate(_TRANSFORM_TABLE),  # Most comprehensive transform
         field_name.replace(' ', '_').replace('/', '_').replace('-', '_'),  # Simple transforms
         field_name.lower().replace(' ', '_'),  # Basic snake case
         field_name.replace(' ', '').lower(),  # Remove all spaces
@@ -20,11 +25,8 @@ def create_field_transforms(field_name):
     # Add all transformations to possible keys
     possible_keys.extend(base_transforms)
     
-    # Remove duplicates while preserving order
-    seen = set()
-    possible_keys = [x for x in possible_keys if not (x in seen or seen.add(x))]
-    
-    return possible_keys
+    # Remove duplicates while preserving order; a tuple so cached results can't be mutated
+    return tuple(dict.fromkeys(possible_keys))
 
 # Test cases
 test_cases = [
@@ -26,40 +26,41 @@ test_fields = [
     "Number of Stockholders with ≥100 shares"
 ]
 
-print("\nField mapping test:")
-print("=" * 50)
+# Specific mappings checked ahead of the basic transforms
+field_mappings = {
+    'Corporate Name': 'business_trade_name',
+    'Covered Person (AML)': 'covered_person_aml',
+    'AMLA Category 1': 'amla_category_1',
+    'Director/Officer_Name': 'director_officer_name_1',
+    'Stockholder_Name': 'stockholder_name_1',
+    'Subscribed Capital_Total': 'filipino_subscribed_capital_amount_php_1',
+    'Paid-Up Capital_Total': 'filipino_paid_up_capital_amount_php_1',
+    'Number of Stockholders with ≥100 shares': 'number_stockholders_100_plus_shares'
+}
 
-for field in test_fields:
-    # Test the mapping logic
-    found_keys = []
-    
-    # Basic transforms
-    transforms = [
+def create_field_transforms(field):
+    """Basic transforms of a field name, in the order they are tried"""
+    return (
         field,
         field.lower().replace(' ', '_').replace('/', '_').replace('-', '_').replace('(', '').replace(')', '').replace('≥', '').replace('.', '').replace("'", ''),
         field.replace(' ', '_').replace('/', '_').replace('-', '_'),
         field.lower().replace(' ', '_'),
-    ]
-    
-    # Check specific mappings
-    field_mappings = {
-        'Corporate Name': 'business_trade_name',
-        'Covered Person (AML)': 'covered_person_aml',
-        'AMLA Category 1': 'amla_category_1',
-        'Director/Officer_Name': 'director_officer_name_1',
-        'Stockholder_Name': 'stockholder_name_1',
-        'Subscribed Capital_Total': 'filipino_subscribed_capital_amount_php_1',
-        'Paid-Up Capital_Total': 'filipino_paid_up_capital_amount_php_1',
-        'Number of Stockholders with ≥100 shares': 'number_stockholders_100_plus_shares'
-    }
-    
-    if field in field_mappings:
-        transforms.insert(0, field_mappings[field])
+    )
+
+# Candidate keys per field, built once: the specific mapping (if any) then the basic transforms
+PRECOMPUTED = {
+    field: ((field_mappings[field],) if field in field_mappings else ()) + create_field_transforms(field)
+    for field in test_fields
+}
+
+print("\nField mapping test:")
+print("=" * 50)
+
+for field in test_fields:
+    transforms = PRECOMPUTED[field]
     
-    # Find matches
-    for transform in transforms:
-        if transform in json_data:
-            found_keys.append(transform)
+    # Find matches, keeping transform order for display
+    found_keys = [transform for transform in transforms if transform in json_data]
     
     print(f"\nField: '{field}'")
     if found_keys:
@@ -68,4 +69,4 @@ for field in test_fields:
             print(f"   Value: {json_data[key]}")
     else:
         print(f"❌ No matches found")
-        print(f"   Tried: {transforms[:3]}...")  # Show first 3 attempts
\ No newline at end of file
+        print(f"   Tried: {list(transforms[:3])}...")  # Show first 3 attempts
\ No newline at end of file